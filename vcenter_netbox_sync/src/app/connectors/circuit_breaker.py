@@ -0,0 +1,79 @@
+import logging
+import threading
+import time
+from collections import deque
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Fail fast while a backend is down.
+
+    The breaker opens once at least min_calls of the last `window` calls were
+    made and failure_rate of them failed. While open every call raises
+    CircuitOpenError without touching the backend. After reset_timeout one
+    probe call is let through: success closes the breaker, failure opens it again.
+    """
+    def __init__(self, name, failure_rate=0.5, window=20, min_calls=5, reset_timeout=30):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.results = deque(maxlen=window)
+        self.state = 'closed'
+        self.opened_at = 0
+        self.times_opened = 0
+        self.rejected = 0
+        self._probing = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == 'open':
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"Circuit '{self.name}' is open")
+                self.state = 'half_open'
+                self._probing = False
+            if self.state == 'half_open':
+                if self._probing:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"Circuit '{self.name}' is half-open, waiting for probe")
+                self._probing = True
+
+    def record_success(self):
+        with self.lock:
+            if self.state == 'half_open':
+                logging.info(f"Circuit '{self.name}' closed.")
+                self.state = 'closed'
+                self.results.clear()
+            self.results.append(True)
+
+    def record_failure(self):
+        with self.lock:
+            if self.state != 'half_open':
+                self.results.append(False)
+                if len(self.results) < self.min_calls or self.results.count(False) / len(self.results) < self.failure_rate:
+                    return
+            self.state = 'open'
+            self.opened_at = time.monotonic()
+            self.times_opened += 1
+            self.results.clear()
+            logging.error(f"Circuit '{self.name}' opened, failing fast for {self.reset_timeout}s.")
+
+    def call(self, func, *args, **kwargs):
+        self.allow()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def snapshot(self):
+        with self.lock:
+            return {'state': self.state, 'times_opened': self.times_opened, 'rejected': self.rejected}
@@ -0,0 +1,103 @@
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from connectors.retry import TokenBucket, backoff_delay, parse_retry_after
+
+# NetBox answers these when overloaded, before touching the request, so even
+# POST and PATCH can safely be sent again
+OVERLOAD_STATUSES = (429, 503)
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that applies a default timeout to every request, since pynetbox
+    never passes one.
+    """
+    def __init__(self, *args, timeout=None, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+        return super().send(request, **kwargs)
+
+
+class RateLimitedHTTPAdapter(TimeoutHTTPAdapter):
+    """
+    Throttle requests with a token bucket and retry overloaded (429/503)
+    responses after the delay the server asks for in Retry-After.
+
+    With a circuit breaker, connection errors and final 5xx responses count as
+    failures and requests fail fast with CircuitOpenError while it is open.
+    """
+    def __init__(self, *args, rate_limit=None, overload_retries=3, backoff_factor=0.5, breaker=None, **kwargs):
+        self.bucket = TokenBucket(rate_limit) if rate_limit else None
+        self.overload_retries = overload_retries
+        self.backoff_factor = backoff_factor
+        self.breaker = breaker
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if self.breaker is None:
+            return self._send_with_retries(request, **kwargs)
+        self.breaker.allow()
+        try:
+            response = self._send_with_retries(request, **kwargs)
+        except requests.RequestException:
+            self.breaker.record_failure()
+            raise
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    def _send_with_retries(self, request, **kwargs):
+        for attempt in range(self.overload_retries + 1):
+            if self.bucket:
+                self.bucket.acquire()
+            response = super().send(request, **kwargs)
+            if response.status_code not in OVERLOAD_STATUSES or attempt == self.overload_retries:
+                return response
+            delay = parse_retry_after(response.headers.get('Retry-After'))
+            if delay is None:
+                delay = backoff_delay(attempt, self.backoff_factor)
+            response.close()
+            time.sleep(min(delay, 60))
+
+
+def create_session(pool_size=10, retries=3, backoff_factor=0.5, timeout=30, verify=True, rate_limit=None, breaker=None):
+    """
+    Build a requests session with a pool of keep-alive connections.
+
+    Concurrent workers each take their own connection from the pool, so
+    pool_size should be at least the number of threads sharing the session.
+    Connection errors and 502/504 are retried for idempotent methods only; a
+    retried POST could create duplicates. Overloaded responses are retried by
+    RateLimitedHTTPAdapter for every method.
+
+    :param pool_size: Maximum number of connections kept open per host
+    :param retries: Retries on connection errors and 502/503/504 responses
+    :param backoff_factor: Base of the exponential delay between retries
+    :param timeout: Default connect and read timeout in seconds
+    :param verify: Verify the server TLS certificate
+    :param rate_limit: Maximum requests per second, unlimited when None
+    :param breaker: Optional CircuitBreaker guarding every request
+    :return: Configured requests.Session
+    """
+    retry = Retry(total=retries, backoff_factor=backoff_factor,
+                  status_forcelist=(502, 504),
+                  allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+                  respect_retry_after_header=False,
+                  raise_on_status=False)
+    adapter = RateLimitedHTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                                     max_retries=retry, timeout=timeout, rate_limit=rate_limit,
+                                     overload_retries=retries, backoff_factor=backoff_factor,
+                                     breaker=breaker)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.verify = verify
+    return session
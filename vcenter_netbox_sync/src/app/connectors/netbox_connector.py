@@ -1,4 +1,3 @@
-WantedBy=multi-user.target
 import pynetbox
 import logging
 import re
@@ -7,6 +6,8 @@ import json
 from datetime import datetime, timedelta
 import warnings
 from urllib3.exceptions import InsecureRequestWarning
+from connectors.http_session import create_session
+from connectors.circuit_breaker import CircuitBreaker
 
 # Suppress only the insecure request warning
 warnings.filterwarnings("ignore", category=InsecureRequestWarning)
@@ -20,11 +21,15 @@ def slugify(text):
     return slug
 
 class NetBoxConnector:
-    def __init__(self, url, token, vcenter_clusters, tags_to_exclude = None):
+    def __init__(self, url, token, vcenter_clusters, tags_to_exclude = None, pool_size=10, retries=3, timeout=30, rate_limit=None):
         self.url = url
         self.token = token
         self.netbox = pynetbox.api(url, token=token)
-        self.netbox.http_session.verify = False
+        # Fails requests fast instead of letting each one time out while NetBox is down
+        self.breaker = CircuitBreaker('netbox')
+        # Shared keep-alive session, reused by every request and worker thread
+        self.netbox.http_session = create_session(pool_size=pool_size, retries=retries, timeout=timeout,
+                                                  verify=False, rate_limit=rate_limit, breaker=self.breaker)
         print(f"Netbox version is {self.netbox.version}")
         self.cluster_mapping = self.build_cluster_mapping(vcenter_clusters)
         self.tags_to_exclude = tags_to_exclude
@@ -0,0 +1,75 @@
+import http.client
+import logging
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# Network errors worth another attempt; API faults are not retried
+TRANSIENT_ERRORS = (OSError, http.client.HTTPException)
+
+
+def backoff_delay(attempt, base=0.5, cap=60):
+    # Exponential backoff with full jitter
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header given either in seconds or as an HTTP date.
+
+    :return: Delay in seconds, or None when the header is missing or invalid
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_call(func, *args, attempts=4, exceptions=TRANSIENT_ERRORS, base=0.5, cap=60, **kwargs):
+    """
+    Call func, retrying transient errors with exponential backoff and jitter.
+
+    :param attempts: Total number of calls before the error is raised
+    :param exceptions: Exception types that trigger a retry
+    :return: Return value of func
+    """
+    for attempt in range(attempts):
+        try:
+            return func(*args, **kwargs)
+        except exceptions as e:
+            if attempt == attempts - 1:
+                raise
+            delay = backoff_delay(attempt, base, cap)
+            logging.warning(f"{getattr(func, '__name__', func)} failed ({e}), retrying in {delay:.2f}s.")
+            time.sleep(delay)
+
+
+class TokenBucket:
+    """
+    Allow `rate` requests per second on average and at most `capacity` in a burst.
+    """
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
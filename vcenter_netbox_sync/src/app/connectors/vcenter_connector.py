@@ -1,39 +1,96 @@
 from pyVim.connect import SmartConnect, Disconnect
-from pyVmomi import vim
+from pyVmomi import vim, vmodl
 import ssl
 import json
 from datetime import datetime
 import os
 from processors.data_processor import VM
+from connectors.retry import retry_call
+from connectors.circuit_breaker import CircuitBreaker
+
+
+# Properties retrieved for every VM in bulk mode; these are exactly the
+# attributes retrieve_vm_details() reads from the managed object.
+VM_PROPERTIES = [
+    'name',
+    'config.uuid',
+    'config.guestFullName',
+    'config.createDate',
+    'config.changeVersion',
+    'config.annotation',
+    'config.hardware.numCPU',
+    'config.hardware.memoryMB',
+    'config.hardware.device',
+    'runtime.powerState',
+    'runtime.host',
+    'guest.ipAddress',
+    'guest.net',
+]
+
+# Inventory objects needed to resolve host -> cluster -> datacenter names
+HIERARCHY_TYPES = [vim.HostSystem, vim.ComputeResource, vim.Folder, vim.Datacenter]
 
 
 class VCenterConnector:
-    def __init__(self, host, user, password, limit = None):
+    def __init__(self, host, user, password, limit = None, bulk = False, page_size = 1000, incremental = False):
         self.host = host
         self.user = user
         self.password = password
         self.si = None
         self.limit = limit
+        # Bulk mode fetches inventory with paged RetrievePropertiesEx calls
+        # instead of walking every VM's properties lazily.
+        self.bulk = bulk
+        self.page_size = page_size
+        # Incremental mode keeps the session, a PropertyCollector filter and its
+        # version token between runs so only changed VMs are returned.
+        self.incremental = incremental
+        self._update_collector = None
+        self._update_view = None
+        self._update_version = None
+        self._vm_properties = {}
+        # Changed VMs held back by `limit`, returned by the next get_vm_updates() call
+        self._pending_updates = set()
+        # True when the last get_vm_updates() call returned the whole inventory
+        self.last_updates_complete = False
+        # Kept with the connector, so an unreachable vCenter also fails fast on the next runs
+        self.breaker = CircuitBreaker('vcenter')
 
     def connect(self):
+        if self.si and self.incremental:
+            if self.si.content.sessionManager.currentSession:
+                return
+            # The session expired, so the update filter and version are gone as well
+            print("vCenter session expired, reconnecting...")
+            self._reset_updates()
+
         print(f"Connecting to vCenter at {self.host}...")
         context = ssl.create_default_context()
         context.check_hostname = False
         context.verify_mode = ssl.CERT_NONE
 
-        self.si = SmartConnect(host=self.host,
-                               user=self.user,
-                               pwd=self.password,
-                               sslContext=context)
+        self.si = self.breaker.call(SmartConnect,
+                                    host=self.host,
+                                    user=self.user,
+                                    pwd=self.password,
+                                    sslContext=context)
         print("Connected to vCenter.")
 
-    def disconnect(self):
+    def disconnect(self, force=False):
         if self.si:
+            if self.incremental and not force:
+                # Keep the session so the update filter survives until the next run
+                return
             print("Disconnecting from vCenter...")
             Disconnect(self.si)
+            self.si = None
+            self._reset_updates()
             print("Disconnected from vCenter.")
 
     def get_vm_info(self):
+        if self.bulk:
+            return self.get_vm_info_bulk()
+
         print("Retrieving VM information...")
         content = self.si.RetrieveContent()
         container = content.rootFolder
@@ -103,21 +160,230 @@ class VCenterConnector:
         return vm_info
 
     def get_ipv6_addresses(self, vm):
+        return self._ipv6_from_guest_net(vm.guest.net if vm.guest else None)
+
+    def _ipv6_from_guest_net(self, guest_net):
         ipv6_addresses = []
-        if vm.guest and vm.guest.net:
-            for net in vm.guest.net:
+        if guest_net:
+            for net in guest_net:
                 if net.ipAddress:
                     for ip_address in net.ipAddress:
                         if ':' in ip_address:  # IPv6 addresses contain colons
                             ipv6_addresses.append(ip_address)
         return ipv6_addresses
 
-    def save_to_json(self, data, filename, append=False):
+    def get_vm_info_bulk(self):
+        print("Retrieving VM information in bulk...")
+        content = self.si.RetrieveContent()
+        parents = self._retrieve_hierarchy(content)
+
+        vm_view = content.viewManager.CreateContainerView(
+            content.rootFolder, [vim.VirtualMachine], True)
+        vm_info_list = []
+        try:
+            for vm_ref, props in self._retrieve_properties(content, vm_view, {vim.VirtualMachine: VM_PROPERTIES}):
+                if self.limit is not None and len(vm_info_list) >= self.limit:
+                    break
+                try:
+                    vm_info = self._vm_from_properties(vm_ref, props, parents)
+                    if vm_info:
+                        vm_info_list.append(vm_info)
+                except (AttributeError, TypeError) as e:
+                    print(f"Error retrieving information for VM {props.get('name', vm_ref._moId)}: {e}")
+                    continue
+        finally:
+            vm_view.Destroy()
+        print(f"Retrieved information for {len(vm_info_list)} VMs.")
+        return vm_info_list
+
+    def _build_filter_spec(self, view, path_sets):
+        traversal_spec = vmodl.query.PropertyCollector.TraversalSpec(
+            name='traverseView', path='view', skip=False, type=vim.view.ContainerView)
+        object_spec = vmodl.query.PropertyCollector.ObjectSpec(
+            obj=view, skip=True, selectSet=[traversal_spec])
+        property_specs = [
+            vmodl.query.PropertyCollector.PropertySpec(type=obj_type, pathSet=paths, all=False)
+            for obj_type, paths in path_sets.items()
+        ]
+        return vmodl.query.PropertyCollector.FilterSpec(
+            objectSet=[object_spec], propSet=property_specs)
+
+    def _retrieve_properties(self, content, view, path_sets):
+        """
+        Yield (object, {property: value}) for every object in a container view.
+
+        :param path_sets: Dictionary mapping managed object types to the property paths to fetch
+        """
+        filter_spec = self._build_filter_spec(view, path_sets)
+        options = vmodl.query.PropertyCollector.RetrieveOptions(maxObjects=self.page_size)
+
+        collector = content.propertyCollector
+        # Property collector calls only read, so dropped connections can be retried
+        result = self._call(collector.RetrievePropertiesEx, [filter_spec], options)
+        while result:
+            for obj_content in result.objects:
+                yield obj_content.obj, {prop.name: prop.val for prop in obj_content.propSet}
+            if not result.token:
+                break
+            result = self._call(collector.ContinueRetrievePropertiesEx, result.token)
+
+    def _call(self, func, *args):
+        # Transient errors are retried first; only a call that still fails counts against the breaker
+        return self.breaker.call(retry_call, func, *args)
+
+    def get_vm_updates(self):
+        """
+        Retrieve VMs created or modified since the previous call.
+
+        The first call (or the first one after the session expired) returns the
+        whole inventory. At most `limit` VMs are returned; the rest are kept for
+        the next call, since the version token has already moved past them.
+
+        :return: Tuple of (list of changed VM objects, list of (VM ID, name) of removed VMs)
+        """
+        print("Retrieving VM changes...")
+        content = self.si.RetrieveContent()
+        if self._update_collector is None:
+            self._create_update_filter(content)
+
+        self.last_updates_complete = self._update_version is None
+        changed, removed_vms = self._collect_updates()
+        changed = [mo_id for mo_id in self._pending_updates | changed if mo_id in self._vm_properties]
+        self._pending_updates = set()
+        if self.limit is not None and len(changed) > self.limit:
+            self._pending_updates = set(changed[self.limit:])
+            changed = changed[:self.limit]
+            self.last_updates_complete = False
+        parents = self._retrieve_hierarchy(content) if changed else {}
+
+        vm_info_list = []
+        for mo_id in changed:
+            props = self._vm_properties[mo_id]
+            try:
+                vm_info = self._vm_from_properties(props['_ref'], props, parents)
+                if vm_info:
+                    vm_info_list.append(vm_info)
+            except (AttributeError, TypeError) as e:
+                print(f"Error retrieving information for VM {props.get('name', mo_id)}: {e}")
+        print(f"Retrieved {len(vm_info_list)} changed and {len(removed_vms)} removed VMs.")
+        return vm_info_list, removed_vms
+
+    def _create_update_filter(self, content):
+        self._update_view = content.viewManager.CreateContainerView(
+            content.rootFolder, [vim.VirtualMachine], True)
+        # A dedicated collector so WaitForUpdatesEx never sees other filters
+        self._update_collector = content.propertyCollector.CreatePropertyCollector()
+        self._update_collector.CreateFilter(
+            self._build_filter_spec(self._update_view, {vim.VirtualMachine: VM_PROPERTIES}),
+            partialUpdates=False)
+        self._update_version = None
+        self._vm_properties = {}
+        self._pending_updates = set()
+
+    def _collect_updates(self):
+        options = vmodl.query.PropertyCollector.WaitOptions(
+            maxWaitSeconds=0, maxObjectUpdates=self.page_size)
+        version = self._update_version or ''
+        changed = set()
+        removed_vms = []
+
+        while True:
+            update_set = self._call(self._update_collector.WaitForUpdatesEx, version, options)
+            if update_set is None:
+                break
+            version = update_set.version
+            for filter_update in update_set.filterSet:
+                for object_update in filter_update.objectSet:
+                    mo_id = object_update.obj._moId
+                    if object_update.kind == 'leave':
+                        props = self._vm_properties.pop(mo_id, {})
+                        # Clones share the UUID, so the name tells which of their records is gone
+                        removed_vms.append((props.get('config.uuid') or mo_id, props.get('name')))
+                        changed.discard(mo_id)
+                        continue
+                    props = self._vm_properties.setdefault(mo_id, {'_ref': object_update.obj})
+                    for change in object_update.changeSet:
+                        if change.op in ('remove', 'indirectRemove'):
+                            props.pop(change.name, None)
+                        else:
+                            props[change.name] = change.val
+                    changed.add(mo_id)
+            if not update_set.truncated:
+                break
+
+        self._update_version = version
+        return changed, removed_vms
+
+    def _reset_updates(self):
+        self._update_collector = None
+        self._update_view = None
+        self._update_version = None
+        self._vm_properties = {}
+        self._pending_updates = set()
+
+    def _retrieve_hierarchy(self, content):
+        # Map every host/cluster/folder/datacenter to its name and parent so
+        # VM placement can be resolved without touching the objects again.
+        view = content.viewManager.CreateContainerView(
+            content.rootFolder, HIERARCHY_TYPES, True)
+        try:
+            return {
+                obj._moId: (props.get('name'), props.get('parent'))
+                for obj, props in self._retrieve_properties(
+                    content, view, {obj_type: ['name', 'parent'] for obj_type in HIERARCHY_TYPES})
+            }
+        finally:
+            view.Destroy()
+
+    def _resolve_placement(self, host_ref, parents):
+        # Same lookup as vm.runtime.host.parent.parent in retrieve_vm_details
+        host = parents.get(host_ref._moId) if host_ref else None
+        cluster = parents.get(host[1]._moId) if host and host[1] else None
+        site = parents.get(cluster[1]._moId) if cluster and cluster[1] else None
+        if cluster and site:
+            return site[0], cluster[0]
+        return "Unknown", "Unknown"
+
+    def _vm_from_properties(self, vm_ref, props, parents):
+        name = props.get('name', vm_ref._moId)
+        if 'config.hardware.numCPU' not in props:
+            print(f"Skipping VM {name} due to missing configuration.")
+            return None
+
+        host_ref = props.get('runtime.host')
+        if host_ref is None:
+            print(f"Skipping VM {name} due to missing host information.")
+            return None
+
+        site, cluster = self._resolve_placement(host_ref, parents)
+        ipv6_addresses = self._ipv6_from_guest_net(props.get('guest.net'))
+        create_date = props.get('config.createDate')
+        devices = props.get('config.hardware.device') or []
+
+        return VM(
+            vm_id=props.get('config.uuid') or vm_ref._moId,
+            name=name,
+            status=props.get('runtime.powerState'),
+            site=site,
+            cluster=cluster,
+            vcpus=props['config.hardware.numCPU'],
+            memory_mb=props.get('config.hardware.memoryMB'),
+            disk=int(sum(disk.capacityInKB / 1024 for disk in devices if isinstance(disk, vim.vm.device.VirtualDisk))),
+            ip_address=props.get('guest.ipAddress') or "Unknown",
+            created=create_date.strftime('%Y-%m-%d %H:%M:%S') if create_date else "Unknown",
+            ipv6=', '.join(ipv6_addresses) if ipv6_addresses else "Unknown",
+            comments=props.get('config.annotation') or "No comments",
+            platform=props.get('config.guestFullName') or "Unknown",
+            last_update=props.get('config.changeVersion') or "Unknown",
+            last_checked=datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        )
+
+    def save_to_json(self, data, filename, append=False, removed_ids=None):
         data_dicts = [vm.to_dict() for vm in data]
         if append and os.path.exists(filename):
             print(f"Appending VM information to {filename}...")
             existing_data = self.read_json(filename)
-            updated_data = self.update_existing_data(existing_data, data_dicts)
+            updated_data = self.update_existing_data(existing_data, data_dicts, removed_ids)
             self.write_json(filename, updated_data)
             print(f"VM information updated in {filename}.")
         else:
@@ -133,8 +399,10 @@ class VCenterConnector:
         with open(filename, 'w') as f:
             json.dump(data, f, indent=4)
 
-    def update_existing_data(self, existing_data, new_data):
+    def update_existing_data(self, existing_data, new_data, removed_ids=None):
         existing_vm_dict = {vm['vm_id']: vm for vm in existing_data}
+        for vm_id in removed_ids or []:
+            existing_vm_dict.pop(vm_id, None)
         for vm_dict in new_data:
             vm_id = vm_dict['vm_id']
             if vm_id in existing_vm_dict:
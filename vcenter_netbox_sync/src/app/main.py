@@ -5,6 +5,7 @@ from datetime import datetime, timedelta
 from connectors.netbox_connector import NetBoxConnector
 from connectors.vcenter_connector import VCenterConnector
 from processors.data_processor import DataProcessor
+from processors.journal import SyncJournal
 import logging
 from flask import Flask, render_template, request, flash
 from flask_wtf import CSRFProtect, FlaskForm
@@ -25,35 +26,50 @@ app.config['SECRET_KEY'] = 'your_secret_key'  # Replace with a secure random key
 status = {
     'last_run': 'N/A',
     'status': 'Idle',
-    'is_running': False
+    'is_running': False,
+    'circuit_breakers': {}
 }
 log_content = 'No log available.'
 
 # Lock to prevent concurrent synchronization
 sync_lock = threading.Lock()
 
+# Kept between runs so the incremental vCenter change feed survives
+vcenter_connector = None
+
+# NetBox batches synced concurrently; also sizes the NetBox connection pool
+max_workers = 4
+
+# Progress of the current run, so a run that died halfway is resumed by the next one
+journal_file = 'sync_journal.db'
+
 def synchronize():
-    global status, log_content
+    global status, log_content, vcenter_connector
     with sync_lock:
         if status['is_running']:
             return
         status['is_running'] = True
         status['status'] = 'Running'
+        netbox_connector = None
+        journal = None
         try:
             # Configuration
 
 
             # Connect to vCenter and get all clusters
-            vcenter_connector = VCenterConnector(vcenter_host, vcenter_user, vcenter_password, vm_limit)
+            if vcenter_connector is None:
+                vcenter_connector = VCenterConnector(vcenter_host, vcenter_user, vcenter_password, vm_limit, bulk=True, incremental=True)
             vcenter_connector.connect()
             vcenter_clusters = vcenter_connector.get_all_clusters()
             vcenter_connector.disconnect()
 
             # Connect to NetBox and build cluster mapping
-            netbox_connector = NetBoxConnector(netbox_url, netbox_token, vcenter_clusters)
+            netbox_connector = NetBoxConnector(netbox_url, netbox_token, vcenter_clusters, pool_size=max_workers)
 
             # Initialize DataProcessor
-            data_processor = DataProcessor(netbox_connector.netbox, netbox_connector.cluster_mapping, vcenter_connector, output_file)
+            journal = SyncJournal(journal_file)
+            data_processor = DataProcessor(netbox_connector.netbox, netbox_connector.cluster_mapping, vcenter_connector, output_file,
+                                           max_workers=max_workers, journal=journal)
 
             # Process VMs
             data_processor.process_vms()
@@ -66,6 +82,12 @@ def synchronize():
             status['status'] = f'Failed: {e}'
         finally:
             status['is_running'] = False
+            if journal is not None:
+                journal.close()
+            status['circuit_breakers'] = {
+                connector.breaker.name: connector.breaker.snapshot()
+                for connector in (vcenter_connector, netbox_connector) if connector is not None
+            }
             # Read log file
             try:
                 with open('/var/log/sync_vcenter_netbox.log', 'r') as f:
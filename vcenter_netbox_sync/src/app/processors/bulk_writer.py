@@ -0,0 +1,82 @@
+import logging
+import pynetbox
+
+
+class BulkWriter:
+    """
+    Queue creates and updates per NetBox endpoint and send them to the list
+    endpoints in batches.
+
+    Every queued item carries a key identifying where it came from (usually the
+    sync task of a vCenter VM). flush() returns the saved records by key, and
+    items NetBox rejected are recorded in `errors` under the same key.
+    """
+    def __init__(self, batch_size=500):
+        self.batch_size = max(1, batch_size)
+        self.errors = {}
+        self._pending = []
+
+    def create(self, endpoint, key, payload):
+        self._pending.append(('create', endpoint, key, payload))
+
+    def update(self, endpoint, key, payload):
+        # payload must contain the object 'id'
+        self._pending.append(('update', endpoint, key, payload))
+
+    def flush(self):
+        """
+        Send everything queued, one list request per endpoint, operation and batch.
+
+        :return: Dictionary mapping each key to the record returned by NetBox
+        """
+        groups = {}
+        for method, endpoint, key, payload in self._pending:
+            group = groups.setdefault((method, endpoint.url), (endpoint, []))
+            group[1].append((key, payload))
+        self._pending = []
+
+        results = {}
+        for (method, _), (endpoint, items) in groups.items():
+            for start in range(0, len(items), self.batch_size):
+                results.update(self._send(method, endpoint, items[start:start + self.batch_size]))
+        return results
+
+    def _send(self, method, endpoint, batch):
+        try:
+            records = getattr(endpoint, method)([payload for _, payload in batch])
+        except pynetbox.RequestError as e:
+            if len(batch) == 1:
+                self.errors[batch[0][0]] = str(e)
+                return {}
+            # NetBox rejects the whole list if a single item is invalid
+            return self._resend_valid_items(method, endpoint, batch, e)
+        return {key: record for (key, _), record in zip(batch, records)}
+
+    def _resend_valid_items(self, method, endpoint, batch, error):
+        item_errors = self._item_errors(error, len(batch))
+        if not item_errors or not any(item_errors):
+            # No per-item details, send the items one by one to find the culprits
+            logging.warning(f"Bulk {method} on {endpoint.name} failed, retrying {len(batch)} items individually: {error}")
+            results = {}
+            for item in batch:
+                results.update(self._send(method, endpoint, [item]))
+            return results
+
+        valid_items = []
+        for item, item_error in zip(batch, item_errors):
+            if item_error:
+                self.errors[item[0]] = str(item_error)
+            else:
+                valid_items.append(item)
+        logging.warning(f"Bulk {method} on {endpoint.name}: {len(batch) - len(valid_items)} of {len(batch)} items rejected.")
+        return self._send(method, endpoint, valid_items) if valid_items else {}
+
+    def _item_errors(self, error, count):
+        # For list requests NetBox answers 400 with one error dict per item
+        try:
+            body = error.req.json()
+        except (AttributeError, ValueError):
+            return None
+        if isinstance(body, list) and len(body) == count:
+            return body
+        return None
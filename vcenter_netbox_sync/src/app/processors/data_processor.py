@@ -6,6 +6,13 @@ import re
 import os
 from datetime import datetime, timedelta
 import ipaddress
+import math
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from processors.bulk_writer import BulkWriter
+from connectors.circuit_breaker import CircuitOpenError
+from processors.reference_cache import NetBoxReferenceCache
+from processors.vm_index import NetBoxAddressIndex, NetBoxVMIndex
 
 def slugify(text):
     # Remove special characters and replace spaces with hyphens
@@ -93,6 +100,9 @@ class VM:
     def parse_dates(self):
         for attr in ['created', 'last_update', 'last_checked']:
             date_str = getattr(self, attr)
+            if date_str is None or isinstance(date_str, datetime):
+                # Already parsed
+                continue
             if date_str != "Unknown":
                 try:
                     date_obj = datetime.strptime(date_str, '%Y-%m-%d %H:%M:%S')
@@ -103,35 +113,84 @@ class VM:
                 setattr(self, attr, None)    
 
 
+class SyncTask:
+    """State of one vCenter VM while it moves through the sync stages."""
+    def __init__(self, vm, vm_netbox=None, cluster=None, site=None):
+        self.vm = vm
+        self.vm_netbox = vm_netbox
+        self.cluster = cluster
+        self.site = site
+        self.interface = None
+        self.primary_ip = None
+        self.failed = False
+
+
 logging.basicConfig(level=logging.INFO)
 
 
 
 class DataProcessor:
-    def __init__(self, netbox_api, cluster_mapping, vcenter_connector, json_file=None):
+    def __init__(self, netbox_api, cluster_mapping, vcenter_connector, json_file=None, batch_size=500, max_workers=1, journal=None,
+                 max_orphan_percent=10):
         self.netbox = netbox_api
         self.cluster_mapping = cluster_mapping
         self.vcenter_connector = vcenter_connector
         self.json_file = json_file
+        # Number of objects sent per list request to NetBox
+        self.batch_size = batch_size
+        # Number of batches synced concurrently, all sharing the connector's pooled
+        # HTTP session, so its pool size should be at least max_workers
+        self.max_workers = max_workers
+        # Optional SyncJournal; an interrupted run is resumed instead of started over
+        self.journal = journal
+        # A full sweep that would orphan more than this share of synced VMs is refused
+        self.max_orphan_percent = max_orphan_percent
         self.SYNC_TAG = "SYNC_FROM_VCENTER"
         self.ORPHANED_TAG = "ORPHANED_FROM_SYNC"
+        # Custom field holding the vCenter UUID (config.uuid) of a VM
+        self.UUID_FIELD = "vcenter_uuid"
         self.status_mapping = {
             'poweredOn': 'active',
             'poweredOff': 'offline',
             # Add more mappings as necessary
         }
         logging.info(f"JSON file set to: {self.json_file}")
+        self.reference_cache = NetBoxReferenceCache(netbox_api)
+        # Filled by prefetch_addresses(); lookups go to the API until then
+        self.address_index = None
+        self.custom_fields = []
+        self.cf_names = []
+
+    def load_reference_data(self):
+        # Sites, clusters, platforms, tags and custom fields are read once per run
+        self.reference_cache.load()
+        self.custom_fields = self.get_custom_fields()
+        self.cf_names = [cf.name for cf in self.custom_fields]
+        logging.info(f"Custom fields names: {self.cf_names}")
+        self.ensure_uuid_field()
+
+    def ensure_uuid_field(self):
+        # VMs are matched on this field, so create it on first run
+        if self.UUID_FIELD in self.cf_names:
+            return
+        object_types = ['virtualization.virtualmachine']
+        # NetBox 4 renamed content_types to object_types
+        types_key = 'object_types' if int(str(self.netbox.version).split('.')[0]) >= 4 else 'content_types'
         try:
-            self.custom_fields = self.get_custom_fields()
-            self.cf_names = [cf.name for cf in self.custom_fields]
-            logging.info(f"Custom fields names: {self.cf_names}")
-        except Exception as e:
-            logging.error(f"Error initializing custom fields: {e}")
-            self.cf_names = []
-        
-        
+            custom_field = self.netbox.extras.custom_fields.create(
+                name=self.UUID_FIELD,
+                label='vCenter UUID',
+                type='text',
+                **{types_key: object_types}
+            )
+            self.custom_fields.append(custom_field)
+            self.cf_names.append(self.UUID_FIELD)
+            logging.info(f"Created custom field '{self.UUID_FIELD}'.")
+        except pynetbox.RequestError as e:
+            logging.error(f"Failed to create custom field '{self.UUID_FIELD}', matching VMs by name only: {e}")
+
     def get_custom_fields(self):
-        return self.netbox.extras.custom_fields.all()    
+        return self.reference_cache.custom_fields
 
     def add_tag_to_vm(self, vm_netbox, new_tag_name):
         # Define the two specific tags
@@ -153,17 +212,8 @@ class DataProcessor:
                 vm_netbox.tags.remove(existing_tags[tag_name])
                 logging.info(f"Removed tag '{tag_name}' from VM '{vm_netbox.name}'.")
 
-        # Add the new tag
-        # Check if the new tag exists in NetBox
-        try:
-            tag = self.netbox.extras.tags.get(name=new_tag_name)
-        except Exception as e:
-            tag = None
-            logging.warning(f"Failed to retrieve tag '{new_tag_name}': {e}")
-        if not tag:
-            # Create the new tag if it doesn't exist
-            tag = self.netbox.extras.tags.create(name=new_tag_name)
-            logging.info(f"Created new tag '{new_tag_name}'.")
+        # Add the new tag, creating it in NetBox if it doesn't exist
+        tag = self.reference_cache.get_or_create_tag(new_tag_name)
         vm_netbox.tags.append(tag)
         logging.info(f"Added new tag '{new_tag_name}' to VM '{vm_netbox.name}'.")
 
@@ -173,15 +223,21 @@ class DataProcessor:
 
 
 
-    def _set_vm_attributes(self, vm_netbox, vm, custom_fields_data, cluster, site, comments=None):
+    def _build_vm_changes(self, vm_netbox, vm, custom_fields_data, cluster, site, primary_ip=None, comments=None):
+        """
+        Compare the desired state of a vCenter VM with its NetBox record.
+
+        :return: Dictionary with only the fields that differ, empty when the record is up to date
+        """
+        desired = {}
         if cluster and site:
             # Check if the cluster's site matches the VM's site
             if cluster.site.id != site.id:
                 logging.error(f"Cluster {cluster.name} is not assigned to site {site.name}. Skipping cluster assignment for VM {vm_netbox.name}.")
-                vm_netbox.cluster = None  # Remove cluster assignment to prevent the 400 error
+                desired['cluster'] = None  # Remove cluster assignment to prevent the 400 error
             else:
-                # Proceed with setting the cluster if it's assigned to the correct site
-                vm_netbox.cluster = cluster
+                desired['cluster'] = cluster.id
+            desired['site'] = site.id
         elif cluster:
             # If site is None, log a warning
             logging.warning(f"Site is not set for VM {vm_netbox.name}. Cannot set cluster.")
@@ -192,128 +248,239 @@ class DataProcessor:
             # Both cluster and site are None, log an error
             logging.error(f"Neither cluster nor site is set for VM {vm_netbox.name}. Cannot update VM attributes.")
 
-        # Set other VM attributes
-        vm_netbox.status = self.status_mapping.get(vm.status, 'active')
-        vm_netbox.platform = self.get_platform_id(vm.platform)
-        vm_netbox.vcpus = vm.vcpus
-        vm_netbox.memory = vm.memory_mb
-        vm_netbox.disk = vm.disk
+        desired['name'] = vm.name  # Picks up renames of UUID-matched VMs
+        desired['status'] = self.status_mapping.get(vm.status, 'active')
+        desired['platform'] = self.get_platform_id(vm.platform)
+        desired['vcpus'] = vm.vcpus
+        desired['memory'] = vm.memory_mb
+        desired['disk'] = vm.disk
+        desired['comments'] = comments if comments else vm.comments
+        desired['tags'] = self._desired_tag_ids(vm_netbox, vm.tags)
+
+        current = {
+            'cluster': self._record_id(vm_netbox.cluster),
+            'site': self._record_id(vm_netbox.site),
+            'name': vm_netbox.name,
+            'status': vm_netbox.status.value if vm_netbox.status else None,
+            'platform': self._record_id(vm_netbox.platform),
+            'vcpus': vm_netbox.vcpus,
+            'memory': vm_netbox.memory,
+            'disk': vm_netbox.disk,
+            'comments': vm_netbox.comments,
+            'tags': sorted(tag.id for tag in vm_netbox.tags),
+        }
+        changes = {field: value for field, value in desired.items() if current[field] != value}
+
+        if primary_ip:
+            # Set as primary if the VM doesn't have one
+            primary_field = f"primary_ip{ipaddress.ip_interface(primary_ip.address).version}"
+            if not getattr(vm_netbox, primary_field):
+                changes[primary_field] = primary_ip.id
+                logging.info(f"Setting IP address {primary_ip.address} as primary for VM {vm_netbox.name}.")
+
+        # last_checked moves on every run, so it alone never triggers a write
+        current_cf = vm_netbox.custom_fields or {}
+        changed_cf = {name: value for name, value in custom_fields_data.items() if current_cf.get(name) != value}
+        if changed_cf and (changes or set(changed_cf) - {'last_checked'}):
+            changes['custom_fields'] = changed_cf
+        return changes
+
+    def _desired_tag_ids(self, vm_netbox, tag_names):
+        # Keep unrelated tags, swap the orphaned tag for the sync tag
+        tag_ids = {tag.id for tag in vm_netbox.tags if tag.name != self.ORPHANED_TAG}
+        for tag_name in list(tag_names) + [self.SYNC_TAG]:
+            tag_ids.add(self.reference_cache.get_or_create_tag(tag_name).id)
+        return sorted(tag_ids)
+
+    def _record_id(self, value):
+        return value.id if hasattr(value, 'id') else value
+
+    def _custom_fields_data(self, vm):
+        custom_fields_data = {}
+        for field in ('created', 'last_update', 'last_checked'):
+            value = getattr(vm, field)
+            if field in self.cf_names and value:
+                custom_fields_data[field] = value.isoformat()
+        if self.UUID_FIELD in self.cf_names and vm.vm_id:
+            custom_fields_data[self.UUID_FIELD] = vm.vm_id
+        return custom_fields_data
+
+    def _sync_tasks(self, tasks):
+        """
+        Run a batch of VMs through the create, interface, IP address and update stages.
+
+        Each stage is sent to NetBox as list requests, so the per-VM ordering
+        (VM -> interface -> IP -> primary IP) holds for the whole batch.
+        """
+        writer = BulkWriter(self.batch_size)
+        self._create_vms(tasks, writer)
+        self._sync_interfaces(tasks, writer)
+        self._sync_ip_addresses(tasks, writer)
+        self._update_vms(tasks, writer)
+
+    def _vm_create_payload(self, task):
+        vm = task.vm
+        return {
+            'name': vm.name,
+            'status': self.status_mapping.get(vm.status, 'active'),
+            'cluster': task.cluster.id,
+            'site': task.site.id,
+            'vcpus': vm.vcpus,
+            'memory': vm.memory_mb,
+            'disk': vm.disk,
+            'platform': self.get_platform_id(vm.platform),
+            'comments': vm.comments,
+            'custom_fields': self._custom_fields_data(vm),
+            'tenant': vm.tenant_id,
+            'role': vm.role_id,
+            'tags': [self.reference_cache.get_or_create_tag(tag_name).id for tag_name in vm.tags + [self.SYNC_TAG]],
+        }
 
-        vm_netbox.custom_fields = custom_fields_data
-        if comments:
-            vm_netbox.comments = comments
-        else:
-            vm_netbox.comments = vm.comments
+    def _create_vms(self, tasks, writer):
+        new_tasks = [task for task in tasks if task.vm_netbox is None]
+        for task in new_tasks:
+            writer.create(self.netbox.virtualization.virtual_machines, task, self._vm_create_payload(task))
+        created = writer.flush()
 
-        # Save the VM object
-        vm_netbox.save()
-    def _set_vm_tags(self, vm_netbox, tags):
-        existing_tags = {tag.name for tag in vm_netbox.tags}
-        for tag_name in tags:
-            if tag_name not in existing_tags:
-                tag = self.netbox.extras.tags.get(name=tag_name)
-                if not tag:
-                    tag = self.netbox.extras.tags.create(name=tag_name)
-                vm_netbox.tags.append(tag)
-        vm_netbox.save()
+        for task in new_tasks:
+            task.vm_netbox = created.get(task)
+            if task.vm_netbox:
+                logging.info(f"VM {task.vm.name} created in NetBox.")
+            else:
+                task.failed = True
+                logging.error(f"Failed to create VM {task.vm.name} in NetBox: {writer.errors.pop(task, None)}")
 
-    def _handle_interfaces(self, vm_netbox, ip_address, is_update=False):
-        if is_update:
-            # During update, do not create a new interface if it doesn't exist
-            interface = self.get_or_create_interface(vm_netbox, create_if_not_exists=True)
-            if interface:
-                self.assign_ip_to_interface(interface, ip_address)
-                # Compare and update VM status
+    def _sync_interfaces(self, tasks, writer):
+        interface_name = 'ens192'
+        new_interfaces = []
+        for task in tasks:
+            if task.failed:
+                continue
+            task.interface = self.find_interface(task.vm_netbox, interface_name)
+            if task.interface:
+                logging.info(f"Interface {interface_name} already exists for VM {task.vm_netbox.name}.")
+                continue
+            logging.info(f"Creating interface {interface_name} for VM {task.vm_netbox.name} with ID {task.vm_netbox.id}")
+            writer.create(self.netbox.virtualization.interfaces, task, {
+                'virtual_machine': task.vm_netbox.id,
+                'name': interface_name,
+                'enabled': True,
+            })
+            new_interfaces.append(task)
+        created = writer.flush()
+
+        for task in new_interfaces:
+            task.interface = created.get(task)
+            if task.interface and self.address_index is not None:
+                self.address_index.add_interface(task.interface)
+            if not task.interface:
+                logging.warning(f"Interface '{interface_name}' could not be created for VM {task.vm_netbox.name}. No IP assigned: {writer.errors.pop(task, None)}")
+
+    def _sync_ip_addresses(self, tasks, writer):
+        # Make sure each VM's IP address exists and is assigned to its interface
+        queued = []
+        for task in tasks:
+            if task.failed or not task.interface:
+                continue
+            ip_address = task.vm.ip_address
+            if not ip_address or ip_address == "Unknown":
+                logging.info(f"No IP address to assign for VM {task.vm_netbox.name}")
+                continue
+            try:
+                ipaddress.ip_address(ip_address)
+            except ValueError:
+                logging.error(f"Invalid IP address: {ip_address}")
+                continue
+
+            existing_ip = self.select_existing_ip(ip_address)
+            assignment = {
+                'assigned_object_type': 'virtualization.vminterface',
+                'assigned_object_id': task.interface.id,
+            }
+            if existing_ip:
+                # Device and VM interfaces are separate tables, so their ids can collide
+                on_this_interface = (existing_ip.assigned_object_type == assignment['assigned_object_type']
+                                     and existing_ip.assigned_object.id == task.interface.id)
+                if existing_ip.assigned_object and not on_this_interface:
+                    logging.warning(f"IP address {ip_address} is already assigned to another interface.")
+                    continue
+                if existing_ip.assigned_object:
+                    # Already assigned to this interface, nothing to write
+                    task.primary_ip = existing_ip
+                    continue
+                writer.update(self.netbox.ipam.ip_addresses, task, {'id': existing_ip.id, **assignment})
             else:
-                logging.warning(f"Interface 'ens192' not found for VM {vm_netbox.name}. No IP assigned.")
-        else:
-            # During creation, create the interface if it doesn't exist
-            interface = self.get_or_create_interface(vm_netbox)
-            self.assign_ip_to_interface(interface, ip_address)
-            # Compare and update VM status
-            #self.compare_and_update_vm_status(vm_netbox, ip_address)
+                writer.create(self.netbox.ipam.ip_addresses, task, {'address': ip_address, **assignment})
+            queued.append(task)
+        saved = writer.flush()
+
+        for task in queued:
+            task.primary_ip = saved.get(task)
+            if task.primary_ip and self.address_index is not None:
+                self.address_index.add_ip_address(task.primary_ip)
+            if task.primary_ip:
+                logging.info(f"Assigned IP address {task.vm.ip_address} to interface {task.interface.name} of VM {task.vm_netbox.name}.")
+                continue
+            error = writer.errors.pop(task, None)
+            if 'Duplicate IP address' in str(error):
+                logging.error(f"Duplicate IP address detected: {task.vm.ip_address}. Skipping assignment.")
+            else:
+                logging.error(f"Failed to assign IP address {task.vm.ip_address} to interface {task.interface.name}: {error}")
 
-    def create_vm_in_netbox(self, vm, netbox_cluster_id, netbox_site_id):
-        status = self.status_mapping.get(vm.status, 'active')
-        platform_id = self.get_platform_id(vm.platform)
-        ip_addresses = [vm.ip_address] if vm.ip_address != "Unknown" else []
+    def _update_vms(self, tasks, writer):
+        # Cluster, site, attributes, tags and primary IP go out in one PATCH per VM
+        queued = []
+        for task in tasks:
+            if task.failed:
+                continue
+            changes = self._build_vm_changes(
+                task.vm_netbox, task.vm, self._custom_fields_data(task.vm), task.cluster, task.site, task.primary_ip)
+            if not changes:
+                logging.info(f"VM {task.vm_netbox.name} is up to date in NetBox.")
+                continue
+            writer.update(self.netbox.virtualization.virtual_machines, task, {'id': task.vm_netbox.id, **changes})
+            queued.append((task, changes))
+        updated = writer.flush()
 
-        custom_fields_data = {}
-        if 'created' in self.cf_names and vm.created:
-            custom_fields_data['created'] = vm.created.isoformat()
-        if 'last_update' in self.cf_names and vm.last_update:
-            custom_fields_data['last_update'] = vm.last_update.isoformat()
-        if 'last_checked' in self.cf_names and vm.last_checked:
-            custom_fields_data['last_checked'] = vm.last_checked.isoformat()
-
-        comments = vm.comments
-
-        tag_names = vm.tags
-        tag_ids = []
-        for tag_name in tag_names:
-            tag = self.netbox.extras.tags.get(name=tag_name)
-            if tag:
-                tag_ids.append(tag.id)
+        for task, changes in queued:
+            if task in updated:
+                logging.info(f"Updated {', '.join(sorted(changes))} for VM {task.vm_netbox.name}.")
             else:
-                tag = self.netbox.extras.tags.create(name=tag_name)
-                tag_ids.append(tag.id)
+                task.failed = True
+                logging.error(f"Failed to update VM {task.vm_netbox.name} in NetBox: {writer.errors.pop(task, None)}")
 
-        # Retrieve the site object from NetBox
-        site = self.netbox.dcim.sites.get(netbox_site_id)
+    def create_vm_in_netbox(self, vm, netbox_cluster_id, netbox_site_id):
+        # Retrieve the site object from the cache
+        site = self.reference_cache.get_site(netbox_site_id)
         if not site:
             logging.error(f"Site with ID {netbox_site_id} not found in NetBox. Cannot create VM {vm.name}.")
             return
 
-        # Retrieve the cluster object from NetBox
-        cluster = self.netbox.virtualization.clusters.get(netbox_cluster_id)
+        # Retrieve the cluster object from the cache
+        cluster = self.reference_cache.get_cluster(netbox_cluster_id)
         if not cluster:
             logging.error(f"Cluster with ID {netbox_cluster_id} not found in NetBox. Cannot create VM {vm.name}.")
             return
 
-        try:
-            vm_netbox = self.netbox.virtualization.virtual_machines.create(
-                name=vm.name,
-                status=status,
-                cluster=netbox_cluster_id,
-                site=site.id,
-                vcpus=vm.vcpus,
-                memory=vm.memory_mb,
-                disk=vm.disk,
-                platform=platform_id,
-                comments=comments,
-                custom_fields=custom_fields_data,
-                tenant=vm.tenant_id,
-                role=vm.role_id,
-                tags=tag_ids
-            )
-            if vm_netbox:
-                # Pass cluster and site to _set_vm_attributes
-                self._set_vm_attributes(vm_netbox, vm, custom_fields_data, cluster, site)
-                self._handle_interfaces(vm_netbox, vm.ip_address)
-                self.add_tag_to_vm(vm_netbox, self.SYNC_TAG)
-                logging.info(f"VM {vm.name} created in NetBox.")
-            else:
-                logging.error(f"Failed to create VM {vm.name} in NetBox.")
-        except Exception as e:
-            logging.error(f"An error occurred while creating VM {vm.name}: {e}")
+        self._sync_tasks([SyncTask(vm, cluster=cluster, site=site)])
 
 
-    def _update_vm_cluster_and_site(self, vm, vm_netbox):
+    def _resolve_cluster_and_site(self, vm, vm_netbox):
         # Get expected cluster and site IDs from vCenter data
         expected_cluster_name = vm.cluster
         cluster_map = self.cluster_mapping.get(expected_cluster_name, self.cluster_mapping.get("Unknown", {}))
         expected_cluster_id = cluster_map.get("netbox_cluster_id")
         expected_site_id = cluster_map.get("netbox_site_id")
 
-        # Retrieve the cluster object from NetBox
+        # Retrieve the cluster object from the cache
         if expected_cluster_id:
-            cluster = self.netbox.virtualization.clusters.get(id=expected_cluster_id)
+            cluster = self.reference_cache.get_cluster(expected_cluster_id)
             if not cluster:
                 # Fallback to "Unknown" cluster
                 unknown_cluster_map = self.cluster_mapping.get("Unknown", {})
                 unknown_cluster_id = unknown_cluster_map.get("netbox_cluster_id")
                 if unknown_cluster_id:
-                    cluster = self.netbox.virtualization.clusters.get(id=unknown_cluster_id)
+                    cluster = self.reference_cache.get_cluster(unknown_cluster_id)
                     if cluster:
                         logging.warning(f"Expected cluster with ID {expected_cluster_id} not found. Assigning VM {vm_netbox.name} to 'Unknown' cluster.")
                     else:
@@ -327,7 +494,7 @@ class DataProcessor:
             unknown_cluster_map = self.cluster_mapping.get("Unknown", {})
             unknown_cluster_id = unknown_cluster_map.get("netbox_cluster_id")
             if unknown_cluster_id:
-                cluster = self.netbox.virtualization.clusters.get(id=unknown_cluster_id)
+                cluster = self.reference_cache.get_cluster(unknown_cluster_id)
                 if not cluster:
                     logging.error(f"Unknown cluster with ID {unknown_cluster_id} not found in NetBox. Cannot update VM {vm_netbox.name}.")
                     return None, None
@@ -337,9 +504,9 @@ class DataProcessor:
                 logging.error(f"No cluster ID found and no 'Unknown' cluster mapped for VM {vm_netbox.name}.")
                 return None, None
 
-        # Retrieve the site object from NetBox
+        # Retrieve the site object from the cache
         if expected_site_id:
-            site = self.netbox.dcim.sites.get(id=expected_site_id)
+            site = self.reference_cache.get_site(expected_site_id)
             if not site:
                 logging.error(f"Site with ID {expected_site_id} not found in NetBox. Cannot update VM {vm_netbox.name}.")
                 return cluster, None
@@ -347,37 +514,19 @@ class DataProcessor:
             logging.error(f"No expected Site ID for VM {vm_netbox.name}.")
             return cluster, None
 
-        # Check if cluster and site need to be updated
         if vm_netbox.cluster != cluster or vm_netbox.site != site:
-            vm_netbox.cluster = cluster
-            vm_netbox.site = site
-            vm_netbox.save()
-            logging.info(f"Updated cluster and site for VM {vm_netbox.name} to cluster {cluster.name} and site {site.name}.")
+            logging.info(f"Moving VM {vm_netbox.name} to cluster {cluster.name} and site {site.name}.")
 
         return cluster, site
 
     def update_vm_in_netbox(self, vm, vm_netbox):
-        # Update cluster and site if necessary
-        cluster, site = self._update_vm_cluster_and_site(vm, vm_netbox)
+        # Resolve the expected cluster and site
+        cluster, site = self._resolve_cluster_and_site(vm, vm_netbox)
         if not cluster or not site:
             logging.error(f"Unable to retrieve cluster or site for VM {vm_netbox.name}. Skipping attribute update.")
             return
 
-        # Prepare custom fields data
-        custom_fields_data = {}
-        if 'created' in self.cf_names and vm.created:
-            custom_fields_data['created'] = vm.created.isoformat()
-        if 'last_update' in self.cf_names and vm.last_update:
-            custom_fields_data['last_update'] = vm.last_update.isoformat()
-        if 'last_checked' in self.cf_names and vm.last_checked:
-            custom_fields_data['last_checked'] = vm.last_checked.isoformat()
-
-        # Update other VM attributes
-        self._set_vm_attributes(vm_netbox, vm, custom_fields_data, cluster, site)
-        self._handle_interfaces(vm_netbox, vm.ip_address, is_update=True)
-        #self.compare_and_update_vm_status(vm_netbox, vm.ip_address)
-        self.add_tag_to_vm(vm_netbox, self.SYNC_TAG)
-        logging.info(f"VM {vm.name} updated in NetBox.")
+        self._sync_tasks([SyncTask(vm, vm_netbox, cluster, site)])
 
 
     def get_netbox_cluster_id_from_vcenter_vm(self, vm):
@@ -399,29 +548,22 @@ class DataProcessor:
             return None
         
 
-  def get_or_create_interface(self, vm, create_if_not_exists=True):
-        interface_name = 'ens192'
-        vm_id = vm.id if isinstance(vm.id, int) else int(vm.id)
-        interface = self.netbox.virtualization.interfaces.get(virtual_machine_id=vm_id, name=interface_name)
-        if interface:
-            logging.info(f"Interface {interface_name} already exists for VM {vm.name}.")
-            return interface
-        else:
-            if create_if_not_exists:
-                logging.info(f"Creating interface {interface_name} for VM {vm.name} with ID {vm_id}")
-                interface = self.netbox.virtualization.interfaces.create(
-                    virtual_machine=vm_id,
-                    name=interface_name,
-                    enabled=True
-                )
-                # Re-fetch the interface to ensure it's fully populated
-                interface = self.netbox.virtualization.interfaces.get(id=interface.id)
-                return interface
-            else:
-                logging.warning(f"Interface {interface_name} does not exist for VM {vm.name}.")
-                return None
+    def prefetch_addresses(self):
+        # All VM interfaces and all IP addresses in a few paged requests. Addresses on
+        # device interfaces are needed too, or they would look free and get duplicated
+        interfaces = self.netbox.virtualization.interfaces.all()
+        ip_addresses = list(self.netbox.ipam.ip_addresses.all())
+        self.address_index = NetBoxAddressIndex(interfaces, ip_addresses)
+        logging.info(f"Prefetched {len(self.address_index.interfaces)} VM interfaces and {len(ip_addresses)} IP addresses.")
+
+    def find_interface(self, vm, interface_name):
+        if self.address_index is not None:
+            return self.address_index.find_interface(vm.id, interface_name)
+        return self.netbox.virtualization.interfaces.get(virtual_machine_id=vm.id, name=interface_name)
 
     def find_existing_ip(self, ip_address):
+        if self.address_index is not None:
+            return self.address_index.find_ip_addresses(ip_address)
         try:
             ips = self.netbox.ipam.ip_addresses.filter(address=ip_address)
             return list(ips)
@@ -429,78 +571,11 @@ class DataProcessor:
             logging.error(f"Failed to find IP address {ip_address}: {e}")
             return []
 
-    def assign_ip_to_interface(self, interface, ip_address):
-        if ip_address and ip_address != "Unknown":
-            try:
-                ip = ipaddress.ip_address(ip_address)
-            except ValueError:
-                logging.error(f"Invalid IP address: {ip_address}")
-                return
-
-            existing_ips = self.find_existing_ip(ip_address)
-            if len(existing_ips) > 1:
-                logging.warning(f"Multiple IP addresses found for {ip_address}. Assigning the first one.")
-                existing_ip = existing_ips[0]
-            elif len(existing_ips) == 1:
-                existing_ip = existing_ips[0]
-            else:
-                existing_ip = None
-
-            vm = interface.virtual_machine  # Retrieve the VM associated with the interface
-
-            # Determine if the VM already has a primary IP
-            if ip.version == 4:
-                current_primary_ip = vm.primary_ip4
-            else:
-                current_primary_ip = vm.primary_ip6
-
-            if existing_ip:
-                if existing_ip.assigned_object and existing_ip.assigned_object.id != interface.id:
-                    logging.warning(f"IP address {ip_address} is already assigned to another interface.")
-                else:
-                    try:
-                        existing_ip.assigned_object_type = 'virtualization.vminterface'
-                        existing_ip.assigned_object_id = interface.id
-                        existing_ip.save()
-
-                        # Set as primary if the VM doesn't have one
-                        if not current_primary_ip:
-                            if ip.version == 4:
-                                vm.primary_ip4 = existing_ip
-                            else:
-                                vm.primary_ip6 = existing_ip
-                            vm.save()
-                            logging.info(f"Set IP address {ip_address} as primary for VM {vm.name}.")
-                    except pynetbox.RequestError as e:
-                        if 'Duplicate IP address' in str(e):
-                            logging.error(f"Duplicate IP address detected: {ip_address}. Skipping assignment.")
-                        else:
-                            logging.error(f"Failed to assign IP address {ip_address} to interface {interface.name}: {e}")
-            else:
-                try:
-                    new_ip = self.netbox.ipam.ip_addresses.create(
-                        address=ip_address,
-                        assigned_object_type='virtualization.vminterface',
-                        assigned_object_id=interface.id
-                    )
-
-                    # Set as primary if the VM doesn't have one
-                    if not current_primary_ip:
-                        if ip.version == 4:
-                            vm.primary_ip4 = new_ip
-                        else:
-                            vm.primary_ip6 = new_ip
-                        vm.save()
-                        logging.info(f"Set IP address {ip_address} as primary for VM {vm.name}.")
-
-                    logging.info(f"Assigned IP address {ip_address} to interface {interface.name} of VM {vm.name}.")
-                except pynetbox.RequestError as e:
-                    if 'Duplicate IP address' in str(e):
-                        logging.error(f"Duplicate IP address detected: {ip_address}. Skipping assignment.")
-                    else:
-                        logging.error(f"Failed to create IP address {ip_address}: {e}")
-        else:
-            logging.info(f"No IP address to assign for VM {interface.virtual_machine.name}")
+    def select_existing_ip(self, ip_address):
+        existing_ips = self.find_existing_ip(ip_address)
+        if len(existing_ips) > 1:
+            logging.warning(f"Multiple IP addresses found for {ip_address}. Assigning the first one.")
+        return existing_ips[0] if existing_ips else None
 
     def compare_and_update_vm_status(self, vm, desired_ip_address):
         if desired_ip_address and desired_ip_address != "Unknown":
@@ -554,32 +629,34 @@ class DataProcessor:
         cleaned_name = platform_name.strip()
         slug = slugify(platform_name)
         # Check if platform with this slug exists
-        platforms = list(self.netbox.dcim.platforms.filter(slug=slug))
-        if platforms:
-            return platforms[0].id
-        else:
+        platform = self.reference_cache.get_platform(slug)
+        if platform:
+            return platform.id
+        with self.reference_cache.lock:
+            # create_platform checks the cache again under the lock
             platform_id = self.create_platform(cleaned_name)
-            if platform_id:
-                return platform_id
-            else:
-                logging.error(f"Unable to create platform {platform_name}. Using default platform ID.")
-                return 1  # Replace with a default platform ID
+        if platform_id:
+            return platform_id
+        else:
+            logging.error(f"Unable to create platform {platform_name}. Using default platform ID.")
+            return 1  # Replace with a default platform ID
 
     def create_platform(self, platform_name):
         try:
             cleaned_name = platform_name.strip()
             slug = slugify(platform_name)
             # Check if platform with this slug already exists
-            existing_platforms = list(self.netbox.dcim.platforms.filter(slug=slug))
-            if existing_platforms:
-                logging.info(f"Platform with slug {slug} already exists. Using existing platform ID {existing_platforms[0].id}.")
-                return existing_platforms[0].id
+            existing_platform = self.reference_cache.get_platform(slug)
+            if existing_platform:
+                logging.info(f"Platform with slug {slug} already exists. Using existing platform ID {existing_platform.id}.")
+                return existing_platform.id
             # If not, create a new platform
             new_platform = self.netbox.dcim.platforms.create(
                 name=cleaned_name,
                 slug=slug,
                 manufacturer=1  # Ensure this is a valid manufacturer ID in NetBox
             )
+            self.reference_cache.add_platform(new_platform)
             logging.info(f"Created new platform: {new_platform.name}")
             return new_platform.id
         except Exception as e:
@@ -595,7 +672,18 @@ class DataProcessor:
         else:
             return True  # or handle accordingly
     def process_vms(self):
-        if self.should_update_vms():
+        removed_vms = []
+        if self.vcenter_connector.incremental:
+            # Only VMs changed since the previous run are returned
+            self.vcenter_connector.connect()
+            vms, removed_vms = self.vcenter_connector.get_vm_updates()
+            if self.json_file:
+                self.vcenter_connector.save_to_json(vms, self.json_file, append=True,
+                                                    removed_ids=[vm_id for vm_id, _ in removed_vms])
+            self.vcenter_connector.disconnect()
+            if removed_vms:
+                logging.info(f"{len(removed_vms)} VMs were removed from vCenter since the last run.")
+        elif self.should_update_vms():
             self.vcenter_connector.connect()
             vms = self.vcenter_connector.get_vm_info()
             self.vcenter_connector.save_to_json(vms, self.json_file)
@@ -603,12 +691,40 @@ class DataProcessor:
         else:
             vms = self.load_vms_from_json()
 
-        # Fetch all VMs from NetBox and group them by name and cluster
-        netbox_vms = self.netbox.virtualization.virtual_machines.all()
-        vm_mapping = {}
-        for vm in netbox_vms:
-            key = (vm.name.lower(), vm.cluster.id if vm.cluster else None)
-            vm_mapping.setdefault(key, []).append(vm)
+        applied_ids = set()
+        if self.journal:
+            # Pending VMs of an interrupted incremental run are no longer reported by vCenter
+            applied_ids, carried, removed_vms = self.journal.begin(
+                [vm.to_dict() for vm in vms], removed_vms, carry_over=self.vcenter_connector.incremental)
+            vms = list(vms) + [VM.from_dict(vm_dict) for vm_dict in carried]
+        # vCenter and the journal hand over dates as strings; custom fields need datetimes
+        for vm in vms:
+            vm.parse_dates()
+
+        self.load_reference_data()
+
+        # Fetch all VMs from NetBox and index them by name, cluster and vCenter UUID
+        self.vm_index = NetBoxVMIndex(self.netbox.virtualization.virtual_machines.all(), self.UUID_FIELD)
+        logging.info(f"Indexed {len(self.vm_index)} NetBox VMs.")
+        self.prefetch_addresses()
+
+        tasks = []
+        # NetBox VMs already matched to a vCenter VM during this run
+        matched_ids = set()
+        # Cloned VMs share a UUID; those only match a record that also has their name
+        uuid_counts = Counter(vm.vm_id for vm in vms)
+        # With the whole inventory, a stored UUID missing from it belongs to a deleted VM
+        inventory_complete = self.vcenter_connector.limit is None and (
+            not self.vcenter_connector.incremental or self.vcenter_connector.last_updates_complete)
+        live_uuids = {vm.vm_id for vm in vms} if inventory_complete else None
+        removed_uuids = {vm_id for vm_id, _ in removed_vms}
+
+        def matchable_by_name(vm_netbox):
+            # Records without a UUID, or whose vCenter VM is gone (e.g. rebuilt under the same name)
+            vm_uuid = self.vm_index.uuid(vm_netbox)
+            if not vm_uuid:
+                return True
+            return vm_uuid not in live_uuids if live_uuids is not None else vm_uuid in removed_uuids
 
         for vcenter_vm in vms:
             vcenter_cluster_name = vcenter_vm.cluster
@@ -617,46 +733,158 @@ class DataProcessor:
             target_site_id = cluster_map.get("netbox_site_id")
 
             # Validate cluster and site IDs
-            if not self.netbox.virtualization.clusters.get(target_cluster_id):
+            cluster = self.reference_cache.get_cluster(target_cluster_id)
+            if not cluster:
                 logging.error(f"Invalid cluster ID {target_cluster_id} for VM {vcenter_vm.name}. Skipping.")
+                self.keep_existing_vms(vcenter_vm, matched_ids)
                 continue
-            if not self.netbox.dcim.sites.get(target_site_id):
+            site = self.reference_cache.get_site(target_site_id)
+            if not site:
                 logging.error(f"Invalid site ID {target_site_id} for VM {vcenter_vm.name}. Skipping.")
+                self.keep_existing_vms(vcenter_vm, matched_ids)
                 continue
 
-            # Normalize vCenter VM name for comparison
-            normalized_vcenter_vm_name = vcenter_vm.name.lower()
+            # Match on the vCenter UUID first; it survives renames and moves
+            existing_vm = self.match_by_uuid(vcenter_vm, matched_ids, uuid_counts[vcenter_vm.vm_id] > 1)
+            if existing_vm:
+                matched_ids.add(existing_vm.id)
+                tasks.append(SyncTask(vcenter_vm, existing_vm, cluster, site))
+                continue
 
-            # Check if VM already exists with the correct cluster and site
-            existing_vms = vm_mapping.get((normalized_vcenter_vm_name, target_cluster_id), [])
+            # Otherwise match by name in the correct cluster
+            existing_vms = [vm for vm in self.vm_index.find(vcenter_vm.name, target_cluster_id, matchable_by_name)
+                            if vm.id not in matched_ids]
             if existing_vms:
-                existing_vm = existing_vms[0]
-                self.update_vm_in_netbox(vcenter_vm, existing_vm)
-                logging.info(f"VM {vcenter_vm.name} updated in NetBox.")
-            else:
-                # Check if VM exists with the same name but different cluster/site
-                for (name, cluster_id), vms_list in vm_mapping.items():
-                    if name == normalized_vcenter_vm_name and cluster_id != target_cluster_id:
-                        for vm in vms_list:
-                            # Update cluster and site
-                            self._update_vm_cluster_and_site(vcenter_vm, vm)
-                            # Update other attributes
-                            self.update_vm_in_netbox(vcenter_vm, vm)
-                            logging.info(f"VM {vm.name} updated with new cluster and site.")
-                # If no existing VM with the correct cluster, create a new one
-                if not existing_vms:
-                    self.create_vm_in_netbox(vcenter_vm, target_cluster_id, target_site_id)
-                    logging.info(f"VM {vcenter_vm.name} created in NetBox.")
-
-
+                matched_ids.add(existing_vms[0].id)
+                tasks.append(SyncTask(vcenter_vm, existing_vms[0], cluster, site))
+                continue
 
+            # Check if the VM was moved: same name in another cluster
+            moved_vms = [vm for vm in self.vm_index.find_in_other_clusters(vcenter_vm.name, target_cluster_id, matchable_by_name)
+                         if vm.id not in matched_ids]
+            for vm in moved_vms:
+                matched_ids.add(vm.id)
+                # Update cluster, site and other attributes
+                logging.info(f"VM {vm.name} will be moved to cluster {cluster.name} and site {site.name}.")
+                tasks.append(SyncTask(vcenter_vm, vm, cluster, site))
+
+            # If the VM doesn't exist in any cluster, create a new one
+            if not moved_vms:
+                tasks.append(SyncTask(vcenter_vm, cluster=cluster, site=site))
+
+        if applied_ids:
+            # Matching above still ran for these, so the orphan sweep sees them
+            tasks = [task for task in tasks if task.vm.vm_id not in applied_ids]
+            logging.info(f"Skipping {len(applied_ids)} VMs already applied by the interrupted run.")
+
+        # Creates and updates are sent to NetBox in batches; independent batches
+        # run concurrently while each keeps its VM -> interface -> IP order
+        # Small runs are split evenly so every worker gets a batch
+        chunk_size = max(1, min(self.batch_size, math.ceil(len(tasks) / self.max_workers)))
+        batches = [tasks[start:start + chunk_size] for start in range(0, len(tasks), chunk_size)]
+        # VMs not applied in this run; the journal keeps them for the next one
+        unapplied = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._sync_tasks, batch): batch for batch in batches}
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    future.result()
+                    applied = [task.vm.vm_id for task in batch if not task.failed]
+                    unapplied += [task.vm.vm_id for task in batch if task.failed]
+                    if self.journal:
+                        self.journal.mark_applied(applied)
+                except CircuitOpenError as e:
+                    unapplied += [task.vm.vm_id for task in batch]
+                    logging.error(f"Skipped batch of {len(batch)} VMs starting with {batch[0].vm.name}: {e}")
+                except Exception as e:
+                    unapplied += [task.vm.vm_id for task in batch]
+                    logging.error(f"Failed to sync batch of {len(batch)} VMs starting with {batch[0].vm.name}: {e}")
+        logging.info(f"Processed {len(tasks)} VMs in batches of {chunk_size} with {self.max_workers} workers.")
+
+        # Without the whole inventory only VMs vCenter reported as removed are orphans
+        if self.vcenter_connector.limit is not None:
+            logging.info("VM limit is set, skipping the orphaned VM sweep.")
+        elif self.vcenter_connector.incremental and not self.vcenter_connector.last_updates_complete:
+            self.tag_and_fail_old_vms(self.find_orphaned_vms(matched_ids, removed_vms))
+        else:
+            old_vms = self.find_orphaned_vms(matched_ids)
+            if self.orphan_sweep_allowed(old_vms):
+                self.tag_and_fail_old_vms(old_vms)
 
+        if not self.journal:
+            return
+        if unapplied:
+            # The incremental feed has already moved past them, so the journal keeps them
+            logging.warning(f"{len(unapplied)} VMs were not applied; they will be retried by the next run.")
+        self.journal.finish(unapplied)
+
+    def match_by_uuid(self, vcenter_vm, matched_ids, same_name_only=False):
+        # Each record is matched once; a record with the VM's name wins over the rest
+        candidates = [vm for vm in self.vm_index.find_by_uuid(vcenter_vm.vm_id) if vm.id not in matched_ids]
+        name = self.vm_index.normalize(vcenter_vm.name)
+        for vm in candidates:
+            if self.vm_index.normalize(vm.name) == name:
+                return vm
+        if candidates and not same_name_only:
+            return candidates[0]
+        return None
+
+    def keep_existing_vms(self, vcenter_vm, matched_ids):
+        # A skipped vCenter VM still exists, so its NetBox records must not be swept as orphans
+        matched_ids.update(vm.id for vm in self.vm_index.find_by_uuid(vcenter_vm.vm_id))
+        matched_ids.update(vm.id for vm in self.vm_index.by_name.get(self.vm_index.normalize(vcenter_vm.name), []))
+
+    def find_orphaned_vms(self, matched_ids, removed_vms=None):
+        """
+        Find NetBox VMs created by the sync that no longer exist in vCenter.
+
+        :param matched_ids: IDs of NetBox VMs matched to a vCenter VM during this run
+        :param removed_vms: (vCenter UUID, name) of removed VMs, when only changes were retrieved
+        :return: List of orphaned NetBox VMs
+        """
+        orphan_ids = self.vm_index.ids_with_tag(self.SYNC_TAG) - matched_ids
+        if removed_vms is not None:
+            removed_ids = set()
+            for vm_uuid, name in removed_vms:
+                records = self.vm_index.find_by_uuid(vm_uuid)
+                if len(records) > 1:
+                    # Clones share the UUID: only the record with the removed VM's name is gone
+                    records = [vm for vm in records
+                               if name and self.vm_index.normalize(vm.name) == self.vm_index.normalize(name)]
+                removed_ids.update(vm.id for vm in records)
+            orphan_ids &= removed_ids
+        return [self.vm_index.find_by_id(vm_id) for vm_id in sorted(orphan_ids)]
+
+    def orphan_sweep_allowed(self, old_vms):
+        # An empty or partial vCenter inventory (permissions, filtering) would fail every synced VM at once
+        synced = len(self.vm_index.ids_with_tag(self.SYNC_TAG))
+        if len(old_vms) > synced * self.max_orphan_percent / 100:
+            logging.error(f"Refusing to mark {len(old_vms)} of {synced} synced VMs as orphaned: "
+                          f"more than {self.max_orphan_percent}% per run. Check the vCenter inventory.")
+            return False
+        return True
+
+    def tag_and_fail_old_vms(self, old_vms):
+        # The sync tag is swapped for the orphaned tag, so each VM is swept only once
+        if not old_vms:
+            return
+        orphaned_tag = self.reference_cache.get_or_create_tag(self.ORPHANED_TAG)
+        writer = BulkWriter(self.batch_size)
+        for old_vm in old_vms:
+            tag_ids = {tag.id for tag in old_vm.tags if tag.name != self.SYNC_TAG}
+            tag_ids.add(orphaned_tag.id)
+            writer.update(self.netbox.virtualization.virtual_machines, old_vm.id,
+                          {'id': old_vm.id, 'status': 'failed', 'tags': sorted(tag_ids)})
+        updated = writer.flush()
+
+        for old_vm in old_vms:
+            if old_vm.id in updated:
+                logging.info(f"VM {old_vm.name} tagged as '{self.ORPHANED_TAG}' and set to 'failed'.")
+            else:
+                logging.error(f"Failed to mark orphaned VM {old_vm.name}: {writer.errors.pop(old_vm.id, None)}")
+        logging.info(f"Marked {len(updated)} of {len(old_vms)} orphaned VMs in NetBox.")
 
     def tag_and_fail_old_vm(self, old_vm):
-        self.  
-
-        self.add_tag_to_vm(old_vm, self.ORPHANED_TAG)
-        old_vm.status = 'failed'
-        old_vm.save()
-        logging.info(f"VM {old_vm.name} tagged as 'ORPHANED_FROM_SYNC' and set to 'failed'.")
+        self.tag_and_fail_old_vms([old_vm])
         
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+
+
+class SyncJournal:
+    """
+    Write-ahead journal of sync runs in a local SQLite file.
+
+    begin() records the planned VMs before anything is sent to NetBox and
+    mark_applied() checkpoints them once NetBox accepted their batch. A run
+    that never reached finish() is resumed by the next begin(): VMs applied
+    with the same data are skipped and planned VMs the new run no longer
+    sees are handed back, so a crash or timeout costs at most the batches
+    that were in flight. VMs NetBox rejected are carried into a fresh run
+    by finish(), so one bad VM never keeps the others from being re-checked.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        # Every commit is durable without rewriting the whole database file
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        with self.conn:
+            self.conn.execute('CREATE TABLE IF NOT EXISTS runs ('
+                              'id INTEGER PRIMARY KEY, started TEXT, finished TEXT, removed_ids TEXT)')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS entries ('
+                              'run_id INTEGER, vm_id TEXT, fingerprint TEXT, data TEXT, applied INTEGER, '
+                              'PRIMARY KEY (run_id, vm_id))')
+        self.run_id = None
+
+    @staticmethod
+    def fingerprint(vm_dict):
+        # last_checked moves on every run and says nothing about what was written
+        data = {k: v for k, v in vm_dict.items() if k != 'last_checked'}
+        return hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode()).hexdigest()
+
+    def begin(self, vm_dicts, removed_vms=(), carry_over=False):
+        """
+        Start a run, or resume the unfinished one.
+
+        :param vm_dicts: Planned VMs as dicts from VM.to_dict()
+        :param removed_vms: (vm_id, name) of VMs removed from vCenter since the previous run
+        :param carry_over: Keep pending VMs of the unfinished run that are missing from vm_dicts
+        :return: (set of vm_ids already applied, pending VM dicts carried over, removed VMs of the run)
+        """
+        planned = {vm['vm_id']: vm for vm in vm_dicts}
+        removed_vms = {tuple(vm) for vm in removed_vms}
+        with self.lock, self.conn:
+            row = self.conn.execute('SELECT id, removed_ids FROM runs WHERE finished IS NULL '
+                                    'ORDER BY id DESC LIMIT 1').fetchone()
+            if row is None:
+                self.run_id = self.conn.execute('INSERT INTO runs (started, removed_ids) VALUES (?, ?)',
+                                                (datetime.now().isoformat(), self._dump_removed(removed_vms))).lastrowid
+                self._plan(planned)
+                return set(), [], removed_vms
+
+            self.run_id = row[0]
+            previous = {vm_id: (fingerprint, data, applied) for vm_id, fingerprint, data, applied in self.conn.execute(
+                'SELECT vm_id, fingerprint, data, applied FROM entries WHERE run_id = ?', (self.run_id,))}
+            removed_vms |= {tuple(vm) for vm in json.loads(row[1])}
+            removed_ids = {vm_id for vm_id, _ in removed_vms}
+            applied, carried = set(), []
+            for vm_id, (fingerprint, data, was_applied) in previous.items():
+                if vm_id in planned:
+                    if was_applied and fingerprint == self.fingerprint(planned[vm_id]):
+                        applied.add(vm_id)
+                elif carry_over and not was_applied and vm_id not in removed_ids:
+                    carried.append(json.loads(data))
+            # Whatever this run does not plan again is dropped from the journal
+            keep = set(planned) | {vm['vm_id'] for vm in carried}
+            self.conn.executemany('DELETE FROM entries WHERE run_id = ? AND vm_id = ?',
+                                  [(self.run_id, vm_id) for vm_id in previous if vm_id not in keep])
+            self._plan({vm_id: vm for vm_id, vm in planned.items() if vm_id not in applied})
+            self.conn.execute('UPDATE runs SET removed_ids = ? WHERE id = ?',
+                              (self._dump_removed(removed_vms), self.run_id))
+        logging.info(f"Resuming unfinished sync run {self.run_id}: {len(applied)} VMs already applied, "
+                     f"{len(carried)} pending VMs carried over.")
+        return applied, carried, removed_vms
+
+    @staticmethod
+    def _dump_removed(removed_vms):
+        # The name of a removed VM may be unknown
+        return json.dumps(sorted(removed_vms, key=lambda vm: (vm[0], vm[1] or '')))
+
+    def _plan(self, planned):
+        self.conn.executemany(
+            'INSERT OR REPLACE INTO entries (run_id, vm_id, fingerprint, data, applied) VALUES (?, ?, ?, ?, 0)',
+            [(self.run_id, vm_id, self.fingerprint(vm), json.dumps(vm, default=str)) for vm_id, vm in planned.items()])
+
+    def mark_applied(self, vm_ids):
+        with self.lock, self.conn:
+            self.conn.executemany('UPDATE entries SET applied = 1 WHERE run_id = ? AND vm_id = ?',
+                                  [(self.run_id, vm_id) for vm_id in vm_ids])
+
+    def finish(self, pending_ids=()):
+        """
+        Close the run; only the latest finished run is kept for reference.
+
+        :param pending_ids: vm_ids NetBox did not accept. They move to a new run with nothing
+            applied, so the next begin() retries them without skipping the VMs that were applied.
+        """
+        pending_ids = set(pending_ids)
+        with self.lock, self.conn:
+            pending = [row for row in self.conn.execute(
+                'SELECT vm_id, fingerprint, data FROM entries WHERE run_id = ?', (self.run_id,))
+                if row[0] in pending_ids]
+            self.conn.execute('UPDATE runs SET finished = ? WHERE id = ?', (datetime.now().isoformat(), self.run_id))
+            self.conn.execute('DELETE FROM entries WHERE run_id = ?', (self.run_id,))
+            self.conn.execute('DELETE FROM runs WHERE id < ?', (self.run_id,))
+            if pending:
+                run_id = self.conn.execute('INSERT INTO runs (started, removed_ids) VALUES (?, ?)',
+                                           (datetime.now().isoformat(), '[]')).lastrowid
+                self.conn.executemany(
+                    'INSERT INTO entries (run_id, vm_id, fingerprint, data, applied) VALUES (?, ?, ?, ?, 0)',
+                    [(run_id, vm_id, fingerprint, data) for vm_id, fingerprint, data in pending])
+        self.run_id = None
+
+    def close(self):
+        self.conn.close()
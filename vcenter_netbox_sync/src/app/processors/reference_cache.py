@@ -0,0 +1,62 @@
+import logging
+import threading
+
+
+class NetBoxReferenceCache:
+    """
+    Per-run cache of the NetBox objects VMs refer to: sites, clusters,
+    platforms, tags and custom fields.
+
+    Everything is loaded once with load(); objects created during the run are
+    written through so later lookups never go back to the API. Creates are
+    serialized with `lock` so concurrent workers don't create duplicates.
+    """
+    def __init__(self, netbox_api):
+        self.netbox = netbox_api
+        self.lock = threading.Lock()
+        self.sites = {}
+        self.clusters = {}
+        self.platforms = {}
+        self.tags = {}
+        self.custom_fields = []
+
+    def load(self):
+        self.sites = {site.id: site for site in self.netbox.dcim.sites.all()}
+        self.clusters = {cluster.id: cluster for cluster in self.netbox.virtualization.clusters.all()}
+        self.platforms = {platform.slug: platform for platform in self.netbox.dcim.platforms.all()}
+        self.tags = {tag.name: tag for tag in self.netbox.extras.tags.all()}
+        try:
+            self.custom_fields = list(self.netbox.extras.custom_fields.all())
+        except Exception as e:
+            logging.error(f"Error loading custom fields: {e}")
+            self.custom_fields = []
+        logging.info(f"Loaded {len(self.sites)} sites, {len(self.clusters)} clusters, "
+                     f"{len(self.platforms)} platforms, {len(self.tags)} tags and "
+                     f"{len(self.custom_fields)} custom fields from NetBox.")
+
+    def get_site(self, site_id):
+        return self.sites.get(site_id)
+
+    def get_cluster(self, cluster_id):
+        return self.clusters.get(cluster_id)
+
+    def get_platform(self, slug):
+        return self.platforms.get(slug)
+
+    def add_platform(self, platform):
+        self.platforms[platform.slug] = platform
+
+    def get_tag(self, name):
+        return self.tags.get(name)
+
+    def get_or_create_tag(self, name):
+        tag = self.tags.get(name)
+        if tag:
+            return tag
+        with self.lock:
+            tag = self.tags.get(name)
+            if not tag:
+                tag = self.netbox.extras.tags.create(name=name)
+                self.tags[name] = tag
+                logging.info(f"Created new tag '{name}'.")
+        return tag
@@ -0,0 +1,85 @@
+class NetBoxVMIndex:
+    """
+    In-memory index of NetBox VMs by (name, cluster ID), by name alone and by
+    the vCenter UUID stored in a custom field, so every lookup is a dict hit.
+    """
+    def __init__(self, netbox_vms, uuid_field):
+        self.uuid_field = uuid_field
+        self.by_name_and_cluster = {}
+        self.by_name = {}
+        self.by_uuid = {}
+        self.by_id = {}
+        for vm in netbox_vms:
+            self.add(vm)
+
+    @staticmethod
+    def normalize(name):
+        return name.lower()
+
+    def add(self, vm):
+        name = self.normalize(vm.name)
+        cluster_id = vm.cluster.id if vm.cluster else None
+        self.by_name_and_cluster.setdefault((name, cluster_id), []).append(vm)
+        self.by_name.setdefault(name, []).append(vm)
+        self.by_id[vm.id] = vm
+        vm_uuid = self.uuid(vm)
+        if vm_uuid:
+            self.by_uuid.setdefault(vm_uuid, []).append(vm)
+
+    def uuid(self, vm):
+        return (vm.custom_fields or {}).get(self.uuid_field)
+
+    def find(self, name, cluster_id, usable=None):
+        # usable, when given, filters out records that must not be matched by name
+        vms = self.by_name_and_cluster.get((self.normalize(name), cluster_id), [])
+        return [vm for vm in vms if usable is None or usable(vm)]
+
+    def find_in_other_clusters(self, name, cluster_id, usable=None):
+        return [vm for vm in self.by_name.get(self.normalize(name), [])
+                if (vm.cluster.id if vm.cluster else None) != cluster_id
+                and (usable is None or usable(vm))]
+
+    def find_by_uuid(self, vm_uuid):
+        # Clones copy config.uuid, so several records can share one
+        return self.by_uuid.get(vm_uuid, [])
+
+    def find_by_id(self, vm_id):
+        return self.by_id.get(vm_id)
+
+    def ids_with_tag(self, tag_name):
+        return {vm.id for vm in self.by_id.values() if any(tag.name == tag_name for tag in vm.tags)}
+
+    def __len__(self):
+        return sum(len(vms) for vms in self.by_name.values())
+
+
+class NetBoxAddressIndex:
+    """
+    In-memory index of VM interfaces by (VM ID, interface name) and of IP
+    addresses by host address. Objects written during the run are added
+    back so later lookups see them.
+    """
+    def __init__(self, interfaces, ip_addresses):
+        self.interfaces = {}
+        self.ip_addresses = {}
+        for interface in interfaces:
+            self.add_interface(interface)
+        for ip in ip_addresses:
+            self.add_ip_address(ip)
+
+    @staticmethod
+    def host(address):
+        return address.split('/')[0]
+
+    def add_interface(self, interface):
+        self.interfaces[(interface.virtual_machine.id, interface.name)] = interface
+
+    def find_interface(self, vm_id, name):
+        return self.interfaces.get((vm_id, name))
+
+    def add_ip_address(self, ip):
+        # Keyed by ID as well, so a re-saved address replaces the stale record
+        self.ip_addresses.setdefault(self.host(ip.address), {})[ip.id] = ip
+
+    def find_ip_addresses(self, address):
+        return list(self.ip_addresses.get(self.host(address), {}).values())
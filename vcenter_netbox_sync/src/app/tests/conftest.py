@@ -0,0 +1,167 @@
+import itertools
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pynetbox
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from processors.data_processor import VM, DataProcessor  # noqa: E402
+
+TAG_NAMES = {10: 'SYNC_FROM_VCENTER', 11: 'ORPHANED_FROM_SYNC'}
+
+
+class Record(SimpleNamespace):
+    pass
+
+
+def request_error(body):
+    response = SimpleNamespace(status_code=400, reason='Bad Request', url='', text=str(body),
+                               json=lambda: body, request=SimpleNamespace(body=''))
+    return pynetbox.RequestError(response)
+
+
+class FakeEndpoint:
+    """pynetbox endpoint over a list of records, recording every write"""
+    def __init__(self, name, records, writes):
+        self.name = name
+        self.url = f'http://netbox/{name}'
+        self.records = records
+        self.writes = writes
+        self.ids = itertools.count(100)
+        # Payloads with this name are rejected like NetBox rejects invalid items
+        self.reject = set()
+
+    def all(self):
+        return list(self.records)
+
+    def filter(self, **filters):
+        return [r for r in self.records if all(getattr(r, k, None) == v for k, v in filters.items())]
+
+    def get(self, **filters):
+        records = self.filter(**filters)
+        return records[0] if records else None
+
+    def create(self, payload=None, **kwargs):
+        items = payload if isinstance(payload, list) else [payload or kwargs]
+        self.writes.append(('create', self.name, len(items)))
+        if any(item.get('name') in self.reject for item in items):
+            raise request_error([{'name': ['invalid']} if item.get('name') in self.reject else {} for item in items])
+        created = [self._record(item) for item in items]
+        return created if isinstance(payload, list) else created[0]
+
+    def update(self, items):
+        self.writes.append(('update', self.name, len(items)))
+        updated = []
+        for item in items:
+            record = next(r for r in self.records if r.id == item['id'])
+            self._apply(record, item)
+            updated.append(record)
+        return updated
+
+    def _record(self, item):
+        record = Record(id=next(self.ids), name=None, cluster=None, site=None, status=None, platform=None,
+                        vcpus=None, memory=None, disk=None, comments='', tags=[], custom_fields={},
+                        primary_ip4=None, primary_ip6=None)
+        self._apply(record, item)
+        self.records.append(record)
+        return record
+
+    def _apply(self, record, item):
+        for field, value in item.items():
+            setattr(record, field, value)
+        if 'tags' in item:
+            record.tags = [Record(id=i, name=TAG_NAMES.get(i, f'tag{i}')) for i in item['tags']]
+        if 'status' in item:
+            record.status = Record(value=item['status'])
+        for field in ('cluster', 'site', 'platform'):
+            if isinstance(item.get(field), int):
+                setattr(record, field, Record(id=item[field]))
+        if 'virtual_machine' in item:
+            record.virtual_machine = Record(id=item['virtual_machine'])
+        if 'assigned_object_id' in item:
+            record.assigned_object = Record(id=item['assigned_object_id'])
+        if 'address' in item and '/' not in item['address']:
+            record.address = item['address'] + '/32'
+
+
+class FakeNetBox:
+    def __init__(self):
+        self.writes = []
+        site = Record(id=1, name='Site', slug='site')
+        self.records = {
+            'sites': [site],
+            'clusters': [Record(id=2, name='Cluster', site=site)],
+            'platforms': [Record(id=3, name='Linux', slug='linux')],
+            'tags': [Record(id=i, name=name) for i, name in TAG_NAMES.items()],
+            'custom_fields': [],
+            'virtual_machines': [],
+            'interfaces': [],
+            'ip_addresses': [],
+        }
+        endpoint = {name: FakeEndpoint(name, records, self.writes) for name, records in self.records.items()}
+        self.dcim = SimpleNamespace(sites=endpoint['sites'], platforms=endpoint['platforms'])
+        self.virtualization = SimpleNamespace(clusters=endpoint['clusters'], interfaces=endpoint['interfaces'],
+                                              virtual_machines=endpoint['virtual_machines'])
+        self.extras = SimpleNamespace(tags=endpoint['tags'], custom_fields=endpoint['custom_fields'])
+        self.ipam = SimpleNamespace(ip_addresses=endpoint['ip_addresses'])
+        self.version = '4.1'
+
+    @property
+    def vms(self):
+        return self.records['virtual_machines']
+
+
+def make_vm(vm_uuid, name, ip_address='Unknown', **fields):
+    vm = VM(vm_uuid, name, 'poweredOn', 'Site', 'Cluster', 2, 1024, 10, ip_address, 'Unknown', 'Unknown',
+            'comments', 'Linux', 'Unknown', 'Unknown')
+    for field, value in fields.items():
+        setattr(vm, field, value)
+    return vm
+
+
+class FakeVCenter:
+    """VCenterConnector serving a fixed inventory; incremental runs get `changes`"""
+    def __init__(self, incremental=False):
+        self.incremental = incremental
+        self.limit = None
+        self.last_updates_complete = True
+        self.inventory = []
+        self.changes = []
+        self.removed = []
+
+    def connect(self):
+        pass
+
+    def disconnect(self):
+        pass
+
+    # Fresh VM objects on every call, like the real connector: the sync mutates them
+    def get_vm_info(self):
+        return [VM.from_dict(vm.to_dict()) for vm in self.inventory]
+
+    def get_vm_updates(self):
+        return [VM.from_dict(vm.to_dict()) for vm in self.changes], list(self.removed)
+
+    def save_to_json(self, *args, **kwargs):
+        pass
+
+
+@pytest.fixture
+def netbox():
+    return FakeNetBox()
+
+
+@pytest.fixture
+def vcenter():
+    return FakeVCenter()
+
+
+@pytest.fixture
+def make_processor(netbox, vcenter):
+    def make(**kwargs):
+        mapping = {'Cluster': {'netbox_cluster_id': 2, 'netbox_site_id': 1}}
+        return DataProcessor(netbox, mapping, vcenter, **kwargs)
+    return make
@@ -0,0 +1,26 @@
+from processors.bulk_writer import BulkWriter
+
+from .conftest import FakeEndpoint
+
+
+def test_rejected_items_are_mapped_to_their_keys():
+    endpoint = FakeEndpoint('virtual_machines', [], [])
+    endpoint.reject = {'bad'}
+    writer = BulkWriter()
+    for name in ('a', 'bad', 'c'):
+        writer.create(endpoint, name, {'name': name})
+    saved = writer.flush()
+    assert sorted(saved) == ['a', 'c']
+    assert saved['a'].name == 'a' and saved['c'].name == 'c'
+    assert list(writer.errors) == ['bad']
+
+
+def test_items_are_sent_one_by_one_without_per_item_errors(monkeypatch):
+    endpoint = FakeEndpoint('virtual_machines', [], [])
+    endpoint.reject = {'bad'}
+    monkeypatch.setattr(BulkWriter, '_item_errors', lambda self, error, count: None)
+    writer = BulkWriter()
+    for name in ('a', 'bad'):
+        writer.create(endpoint, name, {'name': name})
+    assert sorted(writer.flush()) == ['a']
+    assert list(writer.errors) == ['bad']
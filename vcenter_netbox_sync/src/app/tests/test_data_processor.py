@@ -0,0 +1,79 @@
+from processors.data_processor import DataProcessor
+
+from .conftest import Record, make_vm
+
+
+def vm_state(netbox):
+    return sorted((r.name, r.custom_fields.get('vcenter_uuid'), r.status.value) for r in netbox.vms)
+
+
+def test_string_dates_from_incremental_feed(netbox, vcenter, make_processor):
+    netbox.records['custom_fields'] += [Record(id=20, name='created'), Record(id=21, name='last_checked')]
+    vcenter.incremental = True
+    vcenter.changes = [make_vm('U1', 'web', created='2024-01-02 03:04:05', last_checked='2024-05-06 07:08:09')]
+    make_processor().process_vms()
+    assert netbox.vms[0].custom_fields['created'] == '2024-01-02T03:04:05'
+
+
+def test_clones_sharing_a_uuid_keep_their_records(netbox, vcenter, make_processor):
+    processor = make_processor()
+    vcenter.inventory = [make_vm('U1', 'a')]
+    processor.process_vms()
+    vcenter.inventory = [make_vm('U1', 'b'), make_vm('U1', 'a')]
+    processor.process_vms()
+    first = vm_state(netbox)
+    vcenter.inventory.reverse()
+    processor.process_vms()
+    assert vm_state(netbox) == first == [('a', 'U1', 'active'), ('b', 'U1', 'active')]
+
+
+def test_rebuilt_vm_reuses_record_of_deleted_uuid(netbox, vcenter, make_processor):
+    processor = make_processor()
+    vcenter.inventory = [make_vm('OLD', 'web')]
+    processor.process_vms()
+    vcenter.inventory = [make_vm('NEW', 'web')]
+    processor.process_vms()
+    assert vm_state(netbox) == [('web', 'NEW', 'active')]
+
+
+def test_sweep_refuses_to_orphan_whole_inventory(netbox, vcenter, make_processor):
+    processor = make_processor()
+    vcenter.inventory = [make_vm(f'U{i}', f'vm{i}') for i in range(20)]
+    processor.process_vms()
+    vcenter.inventory = []
+    processor.process_vms()
+    assert {status for _, _, status in vm_state(netbox)} == {'active'}
+    vcenter.inventory = [make_vm(f'U{i}', f'vm{i}') for i in range(18)]
+    processor.process_vms()
+    assert [status for _, _, status in vm_state(netbox)].count('failed') == 2
+
+
+def test_removed_clone_does_not_orphan_its_twin(netbox, vcenter, make_processor):
+    processor = make_processor()
+    vcenter.inventory = [make_vm('U1', 'a'), make_vm('U1', 'b')]
+    processor.process_vms()
+    vcenter.incremental = True
+    vcenter.last_updates_complete = False
+    vcenter.removed = [('U1', 'a')]
+    processor.process_vms()
+    assert vm_state(netbox) == [('a', 'U1', 'failed'), ('b', 'U1', 'active')]
+
+
+def test_ip_on_device_interface_is_not_duplicated(netbox, vcenter, make_processor):
+    # The VM interface created below gets id 100 too
+    netbox.records['ip_addresses'].append(
+        Record(id=7, address='10.0.0.1/24', assigned_object_type='dcim.interface',
+               assigned_object=Record(id=100, name='eth0')))
+    vcenter.inventory = [make_vm('U1', 'web', ip_address='10.0.0.1')]
+    make_processor().process_vms()
+    assert ('create', 'ip_addresses', 1) not in netbox.writes
+    assert len(netbox.records['ip_addresses']) == 1
+    assert netbox.vms[0].primary_ip4 is None
+
+
+def test_small_runs_are_split_across_workers(vcenter, make_processor, monkeypatch):
+    batches = []
+    monkeypatch.setattr(DataProcessor, '_sync_tasks', lambda self, tasks: batches.append(len(tasks)))
+    vcenter.inventory = [make_vm(f'U{i}', f'vm{i}') for i in range(10)]
+    make_processor(max_workers=4).process_vms()
+    assert sorted(batches) == [1, 3, 3, 3]
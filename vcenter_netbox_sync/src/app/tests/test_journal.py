@@ -0,0 +1,58 @@
+from processors.data_processor import DataProcessor
+from processors.journal import SyncJournal
+
+from .conftest import make_vm
+
+
+def test_resume_skips_applied_and_replans_changed(tmp_path):
+    journal = SyncJournal(str(tmp_path / 'journal.db'))
+    web, db = make_vm('U1', 'web').to_dict(), make_vm('U2', 'db').to_dict()
+    journal.begin([web, db])
+    journal.mark_applied(['U1', 'U2'])
+
+    applied, carried, _ = SyncJournal(str(tmp_path / 'journal.db')).begin([web, dict(db, vcpus=8)])
+    assert applied == {'U1'} and carried == []
+
+
+def test_finish_drops_the_run(tmp_path):
+    journal = SyncJournal(str(tmp_path / 'journal.db'))
+    journal.begin([make_vm('U1', 'web').to_dict()])
+    journal.finish()
+    assert journal.begin([], carry_over=True) == (set(), [], set())
+
+
+def test_failed_batch_is_carried_into_next_incremental_run(tmp_path, netbox, vcenter, monkeypatch):
+    path = str(tmp_path / 'journal.db')
+    mapping = {'Cluster': {'netbox_cluster_id': 2, 'netbox_site_id': 1}}
+    vcenter.incremental = True
+    vcenter.last_updates_complete = False
+    vcenter.changes = [make_vm(f'U{i}', f'vm{i}') for i in range(4)]
+    sync_tasks = DataProcessor._sync_tasks
+
+    def failing_batch(self, tasks):
+        if tasks[0].vm.name == 'vm3':
+            raise RuntimeError('NetBox unavailable')
+        sync_tasks(self, tasks)
+
+    monkeypatch.setattr(DataProcessor, '_sync_tasks', failing_batch)
+    DataProcessor(netbox, mapping, vcenter, max_workers=4, journal=SyncJournal(path)).process_vms()
+    assert sorted(r.name for r in netbox.vms) == ['vm0', 'vm1', 'vm2']
+
+    # The change feed has moved on: only the journal still knows about vm3
+    monkeypatch.setattr(DataProcessor, '_sync_tasks', sync_tasks)
+    vcenter.changes = []
+    DataProcessor(netbox, mapping, vcenter, max_workers=4, journal=SyncJournal(path)).process_vms()
+    assert sorted(r.name for r in netbox.vms) == ['vm0', 'vm1', 'vm2', 'vm3']
+
+
+def test_rejected_vm_does_not_stop_drift_correction(tmp_path, netbox, vcenter):
+    path = str(tmp_path / 'journal.db')
+    mapping = {'Cluster': {'netbox_cluster_id': 2, 'netbox_site_id': 1}}
+    netbox.virtualization.virtual_machines.reject = {'bad'}
+    vcenter.inventory = [make_vm('U1', 'web'), make_vm('U2', 'bad')]
+    DataProcessor(netbox, mapping, vcenter, journal=SyncJournal(path)).process_vms()
+    assert [r.name for r in netbox.vms] == ['web']
+
+    netbox.vms[0].vcpus = 99
+    DataProcessor(netbox, mapping, vcenter, journal=SyncJournal(path)).process_vms()
+    assert netbox.vms[0].vcpus == 2
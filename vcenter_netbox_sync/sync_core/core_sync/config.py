@@ -7,6 +7,12 @@ class Settings(BaseSettings):
     
     # Redis
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    REDIS_SCAN_BATCH_SIZE: int = int(os.getenv("REDIS_SCAN_BATCH_SIZE", "1000"))
+    REDIS_WRITE_BATCH_SIZE: int = int(os.getenv("REDIS_WRITE_BATCH_SIZE", "1000"))
+    REDIS_TRANSACTIONAL_WRITES: bool = os.getenv("REDIS_TRANSACTIONAL_WRITES", "false").lower() == "true"
+    # Раскладка состояния: "keys" (ключ на entity) или "hash" (hash на источник)
+    STATE_LAYOUT: str = os.getenv("STATE_LAYOUT", "keys")
+    STATE_COMPRESSION: bool = os.getenv("STATE_COMPRESSION", "false").lower() == "true"
     
     # vSphere
     VSPHERE_HOST: str = os.getenv("VSPHERE_HOST", "vcenter.example.com")
@@ -16,11 +22,49 @@ class Settings(BaseSettings):
     # Netbox
     NETBOX_URL: str = os.getenv("NETBOX_URL", "http://netbox.example.com")
     NETBOX_TOKEN: str = os.getenv("NETBOX_TOKEN", "token")
+    NETBOX_PAGE_SIZE: int = int(os.getenv("NETBOX_PAGE_SIZE", "1000"))
+    NETBOX_FETCH_WORKERS: int = int(os.getenv("NETBOX_FETCH_WORKERS", "1"))
+    NETBOX_DELETE_BATCH_SIZE: int = int(os.getenv("NETBOX_DELETE_BATCH_SIZE", "100"))
+    # Custom field с vCenter UUID VM, по нему VM Netbox сопоставляются с vSphere
+    NETBOX_UUID_FIELD: str = os.getenv("NETBOX_UUID_FIELD", "vcenter_uuid")
+    
+    # HTTP
+    HTTP_POOL_SIZE: int = int(os.getenv("HTTP_POOL_SIZE", "10"))
+    HTTP_RETRIES: int = int(os.getenv("HTTP_RETRIES", "3"))
+    HTTP_BACKOFF_FACTOR: float = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.5"))
+    HTTP_TIMEOUT: float = float(os.getenv("HTTP_TIMEOUT", "30"))
+    HTTP_VERIFY_SSL: bool = os.getenv("HTTP_VERIFY_SSL", "true").lower() == "true"
+    HTTP_RETRY_MAX_DELAY: float = float(os.getenv("HTTP_RETRY_MAX_DELAY", "60"))
+    # Запросов в секунду на endpoint, 0 - без ограничения
+    HTTP_RATE_LIMIT: float = float(os.getenv("HTTP_RATE_LIMIT", "0"))
+    HTTP_RATE_BURST: float = float(os.getenv("HTTP_RATE_BURST", "0"))
+    # Нижняя граница адаптивной параллельности; верхняя - размер пула
+    HTTP_MIN_CONCURRENCY: int = int(os.getenv("HTTP_MIN_CONCURRENCY", "1"))
+    
+    # Circuit breaker: открывается, когда доля ошибок среди последних CIRCUIT_WINDOW запросов
+    # (но не меньше CIRCUIT_MIN_CALLS) достигает CIRCUIT_FAILURE_RATE
+    CIRCUIT_FAILURE_RATE: float = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))
+    CIRCUIT_WINDOW: int = int(os.getenv("CIRCUIT_WINDOW", "20"))
+    CIRCUIT_MIN_CALLS: int = int(os.getenv("CIRCUIT_MIN_CALLS", "5"))
+    CIRCUIT_RESET_TIMEOUT: float = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+    
+    # Sync
+    # Сравнивать checksums источника с сохраненным состоянием и не загружать неизмененные entities цели
+    SYNC_FAST_PATH: bool = os.getenv("SYNC_FAST_PATH", "true").lower() == "true"
+    # Стратегия: "conservative" (без удалений) или "aggressive"
+    SYNC_STRATEGY: str = os.getenv("SYNC_STRATEGY", "conservative")
+    SYNC_MAX_DELETE_PERCENT: float = float(os.getenv("SYNC_MAX_DELETE_PERCENT", "10"))
+    # Всегда загружать цель полностью, чтобы находить все лишние entities
+    SYNC_FULL_SCAN: bool = os.getenv("SYNC_FULL_SCAN", "false").lower() == "true"
+    # Сколько entities источника может ждать обработки при потоковой загрузке
+    STREAM_BUFFER_SIZE: int = int(os.getenv("STREAM_BUFFER_SIZE", "1000"))
     
     # Logging
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
     
     class Config:
         env_file = ".env"
+        # В .env есть и переменные docker-compose (PREFECT_API_URL, REDIS_HOST, ...)
+        extra = "ignore"
 
 config = Settings()
\ No newline at end of file
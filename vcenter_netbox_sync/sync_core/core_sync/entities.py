@@ -1 +1,36 @@
 # Модели данных
+from typing import Dict, List
+from pydantic import BaseModel
+from .interfaces import Entity
+
+class Conflict(BaseModel):
+    """Entity, измененная и в источнике, и в цели с момента последней синхронизации"""
+    source: Entity
+    target: Entity
+
+class ChangePlan(BaseModel):
+    """План изменений, полученный за один проход по источнику и цели"""
+    creates: List[Entity] = []
+    updates: List[Entity] = []
+    deletes: List[Entity] = []
+    unchanged: List[str] = []
+    conflicts: List[Conflict] = []
+    # Удаления, отложенные пределом стратегии или не поддерживаемые целью
+    skipped_deletes: List[Entity] = []
+    # Удаления, которые стратегия не выполняет по своей политике
+    deferred_deletes: List[Entity] = []
+    
+    def changes(self) -> List[Entity]:
+        """Entities источника, которые нужно записать в цель"""
+        return self.creates + self.updates
+    
+    def counts(self) -> Dict[str, int]:
+        return {
+            "created": len(self.creates),
+            "updated": len(self.updates),
+            "deleted": len(self.deletes),
+            "unchanged": len(self.unchanged),
+            "conflicts": len(self.conflicts),
+            "delete_skipped": len(self.skipped_deletes),
+            "delete_deferred": len(self.deferred_deletes),
+        }
@@ -1,11 +1,46 @@
 # Базовый адаптер
+import queue
+import threading
 from abc import ABC, abstractmethod
-from typing import List, Dict
+from typing import List, Dict, Iterable, Iterator
 from ...interfaces import DataSource, Entity
+from ...config import config
 from ...utils.logging import get_logger
 
 logger = get_logger(__name__)
 
+# Маркер конца потока entities
+_DONE = object()
+
+class _FetchError:
+    """Ошибка потока загрузки, передаваемая потребителю через очередь"""
+    
+    def __init__(self, error: Exception):
+        self.error = error
+
+class EntityStream(Iterator[Entity]):
+    """Entities из ограниченной очереди, которую заполняет поток загрузки"""
+    
+    def __init__(self, buffer: queue.Queue, stop: threading.Event):
+        self._buffer = buffer
+        self._stop = stop
+    
+    def __next__(self) -> Entity:
+        if self._stop.is_set():
+            raise StopIteration
+        item = self._buffer.get()
+        if item is _DONE:
+            self.close()
+            raise StopIteration
+        if isinstance(item, _FetchError):
+            self.close()
+            raise item.error
+        return item
+    
+    def close(self):
+        """Остановка потока загрузки, если потребитель закончил раньше"""
+        self._stop.set()
+
 class BaseDataSource(DataSource, ABC):
     """Базовый класс для адаптеров источников данных"""
     
@@ -14,23 +49,68 @@ class BaseDataSource(DataSource, ABC):
     
     def get_entities(self) -> List[Entity]:
         """Получение всех entities из источника"""
+        return list(self.iter_entities())
+    
+    def iter_entities(self) -> EntityStream:
+        """
+        Потоковое получение entities.
+        
+        Загрузка и конвертация начинаются в отдельном потоке сразу, а не при первом
+        обращении к итератору, и заполняют ограниченную очередь (STREAM_BUFFER_SIZE).
+        Пока потребитель занят (например, загрузкой цели), источник загружается
+        параллельно, но в памяти не держится полный список записей.
+        """
         logger.info(f"Fetching entities from {self.name}")
-        raw_data = self._fetch_raw_data()
-        return self._convert_to_entities(raw_data)
+        buffer = queue.Queue(maxsize=config.STREAM_BUFFER_SIZE)
+        stop = threading.Event()
+        
+        def produce():
+            try:
+                for item in self._fetch_raw_data():
+                    if not self._put(buffer, self._convert_entity(item), stop):
+                        return
+                self._put(buffer, _DONE, stop)
+            except Exception as e:
+                self._put(buffer, _FetchError(e), stop)
+        
+        threading.Thread(target=produce, name=f"{self.name}-fetch", daemon=True).start()
+        return EntityStream(buffer, stop)
+    
+    @staticmethod
+    def _put(buffer: queue.Queue, item, stop: threading.Event) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
     
     def apply_changes(self, changes: List[Entity]) -> bool:
         """Применение изменений к источнику"""
         logger.info(f"Applying {len(changes)} changes to {self.name}")
         return self._apply_changes_impl(changes)
     
+    def delete_entities(self, entities: List[Entity]) -> bool:
+        """Удаление entities из источника"""
+        logger.info(f"Deleting {len(entities)} entities from {self.name}")
+        return self._delete_entities_impl(entities)
+    
+    def _delete_entities_impl(self, entities: List[Entity]) -> bool:
+        raise NotImplementedError(f"{self.name} does not support deleting entities")
+    
     @abstractmethod
-    def _fetch_raw_data(self) -> List[Dict]:
-        """Абстрактный метод для получения сырых данных"""
+    def _fetch_raw_data(self) -> Iterable[Dict]:
+        """Абстрактный метод для получения сырых данных (список или генератор)"""
         pass
     
+    def _convert_to_entities(self, raw_data: Iterable[Dict]) -> List[Entity]:
+        """Преобразование сырых данных в entities"""
+        return [self._convert_entity(item) for item in raw_data]
+    
     @abstractmethod
-    def _convert_to_entities(self, raw_data: List[Dict]) -> List[Entity]:
-        """Абстрактный метод для преобразования сырых данных в entities"""
+    def _convert_entity(self, item: Dict) -> Entity:
+        """Абстрактный метод для преобразования одной записи в entity"""
         pass
     
     @abstractmethod
@@ -1,12 +1,16 @@
 # Адаптер для Netbox
-import requests
-import hashlib
-import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict
+from itertools import islice
+from typing import List, Dict, Iterable, Iterator
 from ...interfaces import Entity
 from .base import BaseDataSource
 from ...utils.logging import get_logger
+from ...utils.http import create_session
+from ...utils.circuit_breaker import CircuitBreaker
+from ...utils.retry import retry
+from ...utils.hashing import vm_checksum
 from ...config import config
 
 logger = get_logger(__name__)
@@ -14,56 +18,129 @@ logger = get_logger(__name__)
 class NetboxAdapter(BaseDataSource):
     """Адаптер для работы с Netbox"""
     
+    VM_ENDPOINT = "/api/virtualization/virtual-machines/"
+    supports_delete = True
+    # Количество значений фильтра в одном запросе, ограничено длиной URL
+    ID_CHUNK_SIZE = 100
+    
     def __init__(self):
         super().__init__("netbox")
         self.url = config.NETBOX_URL
         self.token = config.NETBOX_TOKEN
+        self.page_size = config.NETBOX_PAGE_SIZE
+        self.fetch_workers = config.NETBOX_FETCH_WORKERS
         self.headers = {
             "Authorization": f"Token {self.token}",
             "Content-Type": "application/json",
         }
+        # Недоступный Netbox отклоняет запросы сразу, а не по таймауту на каждый
+        self.breaker = CircuitBreaker("netbox")
+        # Одна сессия на адаптер: соединения переиспользуются между страницами и потоками
+        self.session = create_session(
+            pool_size=max(config.HTTP_POOL_SIZE, self.fetch_workers),
+            headers=self.headers,
+            breaker=self.breaker
+        )
     
-    def _fetch_raw_data(self) -> List[Dict]:
-        """Получение сырых данных из Netbox"""
+    def _fetch_raw_data(self) -> Iterator[Dict]:
+        """Постраничное получение сырых данных из Netbox (генератор)"""
+        logger.info("Fetching data from Netbox")
         try:
-            logger.info("Fetching data from Netbox")
-            response = requests.get(
-                f"{self.url}/api/virtualization/virtual-machines/",
-                headers=self.headers,
-                timeout=30
-            )
-            response.raise_for_status()
-            return response.json()["results"]
+            if self.fetch_workers > 1:
+                yield from self._fetch_pages_parallel()
+            else:
+                yield from self._fetch_pages()
         except Exception as e:
+            # Неполный список хуже ошибки: отсутствующие VM выглядели бы удаленными
             logger.error(f"Error fetching from Netbox: {e}")
-            return []
+            raise
+    
+    # Статусы повторяет сессия; здесь повторяются обрывы соединения, в том числе при чтении тела ответа
+    @retry(statuses=())
+    def _get_page(self, url: str, params: Dict = None) -> Dict:
+        """Получение одной страницы списка"""
+        response = self.session.get(url, params=params)
+        response.raise_for_status()
+        return response.json()
+    
+    def get_entities_by_keys(self, keys: Iterable[str], alt_keys: Iterable[str] = ()) -> List[Entity]:
+        """Загрузка VM фильтрами по custom field с vCenter UUID и по имени"""
+        keys, alt_keys = set(keys), set(alt_keys)
+        logger.info(f"Fetching entities by {len(keys)} keys and {len(alt_keys)} names from Netbox")
+        items = {}
+        for item in self._fetch_chunked(f"cf_{config.NETBOX_UUID_FIELD}", sorted(keys)):
+            items[item["id"]] = item
+        for item in self._fetch_chunked("name__ie", sorted(alt_keys)):
+            items[item["id"]] = item
+        # По имени находятся и VM с другим UUID: пары для них ищутся только по key
+        return [e for e in self._convert_to_entities(items.values())
+                if e.match_key in keys or (not e.key and e.alt_key in alt_keys)]
+    
+    def _fetch_chunked(self, field: str, values: List[str]) -> Iterator[Dict]:
+        """Загрузка по фильтру field со списком значений, частями по ID_CHUNK_SIZE"""
+        for start in range(0, len(values), self.ID_CHUNK_SIZE):
+            chunk = values[start:start + self.ID_CHUNK_SIZE]
+            yield from self._fetch_pages({field: chunk, "limit": self.page_size})
+    
+    def _fetch_pages(self, params: Dict = None) -> Iterator[Dict]:
+        """Последовательный обход страниц по ссылкам next"""
+        url = f"{self.url}{self.VM_ENDPOINT}"
+        params = params or {"limit": self.page_size}
+        while url:
+            page = self._get_page(url, params)
+            yield from page["results"]
+            # Ссылка next уже содержит limit и offset
+            url, params = page.get("next"), None
     
-    def _convert_to_entities(self, raw_data: List[Dict]) -> List[Entity]:
-        """Преобразование сырых данных Netbox в entities"""
-        entities = []
-        for item in raw_data:
-            # Создаем checksum на основе данных
-            checksum_data = {
-                "name": item["name"],
-                "status": item["status"]["value"],
-                "vcpus": item["vcpus"],
-                "memory": item["memory"]
-            }
-            checksum = hashlib.md5(
-                json.dumps(checksum_data, sort_keys=True).encode()
-            ).hexdigest()
-            
-            entity = Entity(
-                id=f"netbox-{item['id']}",
-                source="netbox",
-                source_id=str(item["id"]),
-                last_updated=datetime.now(),
-                checksum=checksum,
-                data=item
-            )
-            entities.append(entity)
+    def _fetch_pages_parallel(self) -> Iterator[Dict]:
+        """Параллельная загрузка страниц по offset после получения count"""
+        url = f"{self.url}{self.VM_ENDPOINT}"
+        first_page = self._get_page(url, {"limit": self.page_size, "offset": 0})
+        yield from first_page["results"]
         
-        return entities
+        # Размер страницы может быть ограничен MAX_PAGE_SIZE на стороне Netbox
+        page_size = len(first_page["results"]) or self.page_size
+        offsets = iter(range(page_size, first_page["count"], page_size))
+        
+        def fetch(offset: int) -> Dict:
+            return self._get_page(url, {"limit": page_size, "offset": offset})
+        
+        # В памяти держим не больше fetch_workers страниц одновременно
+        with ThreadPoolExecutor(max_workers=self.fetch_workers) as executor:
+            pending = deque(executor.submit(fetch, offset) for offset in islice(offsets, self.fetch_workers))
+            while pending:
+                page = pending.popleft().result()
+                next_offset = next(offsets, None)
+                if next_offset is not None:
+                    pending.append(executor.submit(fetch, next_offset))
+                yield from page["results"]
+    
+    def _convert_entity(self, item: Dict) -> Entity:
+        """Преобразование записи Netbox в entity"""
+        # Checksum по каноническим полям, совпадает с checksum той же VM в vSphere
+        checksum = vm_checksum(
+            item["name"], item["status"]["value"], item["vcpus"], item["memory"]
+        )
+        return Entity(
+            id=f"netbox-{item['id']}",
+            source="netbox",
+            source_id=str(item["id"]),
+            last_updated=datetime.now(),
+            checksum=checksum,
+            data=item,
+            key=(item.get("custom_fields") or {}).get(config.NETBOX_UUID_FIELD),
+            alt_key=item["name"].lower()
+        )
+    
+    def _delete_entities_impl(self, entities: List[Entity]) -> bool:
+        """Пакетное удаление VM: один DELETE списка id на пачку"""
+        url = f"{self.url}{self.VM_ENDPOINT}"
+        ids = [int(e.source_id) for e in entities]
+        batch_size = config.NETBOX_DELETE_BATCH_SIZE
+        for start in range(0, len(ids), batch_size):
+            response = self.session.delete(url, json=[{"id": vm_id} for vm_id in ids[start:start + batch_size]])
+            response.raise_for_status()
+        return True
     
     def _apply_changes_impl(self, changes: List[Entity]) -> bool:
         """Применение изменений к Netbox"""
@@ -1,11 +1,10 @@
 # Адаптер для vSphere
-import hashlib
-import json
 from datetime import datetime
 from typing import List, Dict
 from ...interfaces import Entity
 from .base import BaseDataSource
 from ...utils.logging import get_logger
+from ...utils.hashing import vm_checksum
 
 logger = get_logger(__name__)
 
@@ -26,39 +25,33 @@ class VSphereAdapter(BaseDataSource):
         return [
             {
                 "id": "vm-001",
+                "uuid": "4210a1b2-0000-0000-0000-000000000001",
                 "name": "test-vm-1",
+                "datacenter": "dc-01",
+                "cluster": "cluster-01",
                 "power_state": "poweredOn",
                 "cpu_count": 2,
                 "memory_mb": 4096
             }
         ]
     
-    def _convert_to_entities(self, raw_data: List[Dict]) -> List[Entity]:
-        """Преобразование сырых данных vSphere в entities"""
-        entities = []
-        for item in raw_data:
-            # Создаем checksum на основе данных
-            checksum_data = {
-                "name": item["name"],
-                "power_state": item["power_state"],
-                "cpu_count": item["cpu_count"],
-                "memory_mb": item["memory_mb"]
-            }
-            checksum = hashlib.md5(
-                json.dumps(checksum_data, sort_keys=True).encode()
-            ).hexdigest()
-            
-            entity = Entity(
-                id=f"vsphere-{item['id']}",
-                source="vsphere",
-                source_id=item["id"],
-                last_updated=datetime.now(),
-                checksum=checksum,
-                data=item
-            )
-            entities.append(entity)
-        
-        return entities
+    def _convert_entity(self, item: Dict) -> Entity:
+        """Преобразование записи vSphere в entity"""
+        # Checksum по каноническим полям, совпадает с checksum той же VM в Netbox
+        checksum = vm_checksum(
+            item["name"], item["power_state"], item["cpu_count"], item["memory_mb"]
+        )
+        return Entity(
+            id=f"vsphere-{item['id']}",
+            source="vsphere",
+            source_id=item["id"],
+            last_updated=datetime.now(),
+            checksum=checksum,
+            data=item,
+            # config.uuid, тот же UUID хранится в custom field VM в Netbox
+            key=item.get("uuid"),
+            alt_key=item["name"].lower()
+        )
     
     def _apply_changes_impl(self, changes: List[Entity]) -> bool:
         """Применение изменений к vSphere"""
@@ -0,0 +1,76 @@
+# Дерево checksums: datacenter -> cluster -> VM
+import hashlib
+import json
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from ..interfaces import Entity
+
+ClusterKey = Tuple[str, str]
+
+
+def cluster_key(entity: Entity) -> ClusterKey:
+    """Положение entity в дереве; entities без datacenter/cluster попадают в общий узел"""
+    return entity.data.get("datacenter") or "", entity.data.get("cluster") or ""
+
+
+def _hash(items: List) -> str:
+    return hashlib.md5(json.dumps(items).encode()).hexdigest()
+
+
+def build_tree(entities: Iterable[Entity]) -> Dict[str, Any]:
+    """Построение дерева хешей по entities"""
+    return tree_from_leaves((cluster_key(e), e.source_id, e.checksum) for e in entities)
+
+
+def tree_from_leaves(leaves: Iterable[Tuple[ClusterKey, str, str]]) -> Dict[str, Any]:
+    """
+    Построение дерева хешей по листьям (cluster_key, source_id, checksum).
+    
+    Хеш кластера считается по отсортированным парам (source_id, checksum),
+    поэтому меняется при изменении, добавлении или удалении любой его VM.
+    Листья позволяют построить дерево, не держа в памяти сами entities.
+    """
+    by_cluster = defaultdict(list)
+    for key, source_id, checksum in leaves:
+        by_cluster[key].append((source_id, checksum))
+    
+    datacenters = {}
+    for (datacenter, cluster), items in by_cluster.items():
+        node = datacenters.setdefault(datacenter, {"clusters": {}})
+        node["clusters"][cluster] = _hash(sorted(items))
+    for node in datacenters.values():
+        node["hash"] = _hash(sorted(node["clusters"].items()))
+    
+    return {
+        "hash": _hash(sorted((name, node["hash"]) for name, node in datacenters.items())),
+        "datacenters": datacenters,
+    }
+
+
+def changed_clusters(old_tree: Optional[Dict[str, Any]], new_tree: Dict[str, Any]) -> Set[ClusterKey]:
+    """Кластеры нового дерева, хеш которых отличается от старого; спуск только по отличающимся узлам"""
+    if old_tree and old_tree["hash"] == new_tree["hash"]:
+        return set()
+    old_datacenters = old_tree["datacenters"] if old_tree else {}
+    changed = set()
+    for datacenter, node in new_tree["datacenters"].items():
+        old_node = old_datacenters.get(datacenter)
+        if old_node and old_node["hash"] == node["hash"]:
+            continue
+        old_clusters = old_node["clusters"] if old_node else {}
+        changed.update(
+            (datacenter, cluster) for cluster, cluster_hash in node["clusters"].items()
+            if old_clusters.get(cluster) != cluster_hash
+        )
+    return changed
+
+
+def invalidate(tree: Dict[str, Any], keys: Iterable[ClusterKey]) -> Dict[str, Any]:
+    """Сброс хешей узлов, чтобы следующий запуск проверил эти кластеры заново"""
+    for datacenter, cluster in keys:
+        node = tree["datacenters"].get(datacenter)
+        if node and cluster in node["clusters"]:
+            node["clusters"][cluster] = ""
+            node["hash"] = ""
+            tree["hash"] = ""
+    return tree
@@ -0,0 +1,71 @@
+# Планировщик изменений
+from typing import Callable, Dict, Iterable, List, Optional
+from ..interfaces import Entity
+from ..entities import ChangePlan, Conflict
+
+class DiffPlanner:
+    """Построение плана изменений за один проход"""
+    
+    def plan(self, source_entities: Iterable[Entity], target_entities: Iterable[Entity],
+             baseline: Optional[Dict[str, str]] = None,
+             on_unchanged: Optional[Callable[[Entity], None]] = None) -> ChangePlan:
+        """
+        Сравнение источника и цели по checksum.
+        
+        Пары составляются по match_key. Entity источника без пары сопоставляется
+        по alt_key с entity цели, у которой нет key (запись, созданная не синхронизацией).
+        
+        baseline - checksums источника с последней успешной синхронизации.
+        Если с тех пор изменились и источник, и цель, entity считается конфликтом.
+        
+        В плане от неизмененных entities остаются только source_id; on_unchanged
+        получает сами entities, пока источник обходится.
+        """
+        # Словари строятся только по цели, источник обходится один раз
+        target_map = {}
+        by_alt_key: Dict[str, List[str]] = {}
+        for e in target_entities:
+            target_map[e.match_key] = e
+            if not e.key and e.alt_key:
+                by_alt_key.setdefault(e.alt_key, []).append(e.match_key)
+        creates, updates, unchanged, conflicts = [], [], [], []
+        
+        for entity in source_entities:
+            target = target_map.pop(entity.match_key, None)
+            if target is None and entity.alt_key:
+                target = self._pop_by_alt_key(target_map, by_alt_key, entity.alt_key)
+            if target is None:
+                creates.append(entity)
+            elif entity.checksum == target.checksum:
+                unchanged.append(entity.source_id)
+                if on_unchanged is not None:
+                    on_unchanged(entity)
+            elif self._is_conflict(entity, target, baseline):
+                conflicts.append(Conflict(source=entity, target=target))
+            else:
+                updates.append(entity)
+        
+        # Все, что осталось в цели, отсутствует в источнике
+        return ChangePlan(
+            creates=creates,
+            updates=updates,
+            deletes=list(target_map.values()),
+            unchanged=unchanged,
+            conflicts=conflicts
+        )
+    
+    @staticmethod
+    def _pop_by_alt_key(target_map: Dict[str, Entity], by_alt_key: Dict[str, List[str]],
+                        alt_key: str) -> Optional[Entity]:
+        for match_key in by_alt_key.get(alt_key, []):
+            target = target_map.pop(match_key, None)
+            if target is not None:
+                return target
+        return None
+    
+    def _is_conflict(self, entity: Entity, target: Entity,
+                     baseline: Optional[Dict[str, str]]) -> bool:
+        if not baseline or entity.source_id not in baseline:
+            return False
+        known = baseline[entity.source_id]
+        return entity.checksum != known and target.checksum != known
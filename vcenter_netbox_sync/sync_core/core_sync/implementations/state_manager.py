@@ -1,10 +1,29 @@
 # Реализация StateManager
 import redis
 import json
-from typing import List, Optional
+import zlib
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, Optional
 from ..interfaces import StateManager, Entity
 from ..config import config
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _batches(items: Iterable, size: int) -> Iterator[list]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
 class RedisStateManager(StateManager):
     """Реализация StateManager с использованием Redis"""
     
@@ -21,6 +40,13 @@ class RedisStateManager(StateManager):
             return Entity.parse_raw(data)
         return None
     
+    def get_entities(self, source: str, source_ids: Iterable[str]) -> List[Entity]:
+        """Один MGET на пачку ключей"""
+        entities = []
+        for batch in _batches(source_ids, config.REDIS_SCAN_BATCH_SIZE):
+            entities.extend(self._load_batch([self._get_key(source, source_id) for source_id in batch]))
+        return entities
+    
     def save_entity(self, entity: Entity) -> bool:
         key = self._get_key(entity.source, entity.source_id)
         return self.redis.set(key, entity.json())
@@ -29,14 +55,178 @@ class RedisStateManager(StateManager):
         key = self._get_key(source, source_id)
         return bool(self.redis.delete(key))
     
+    def get_tree(self, source: str) -> Optional[Dict[str, Any]]:
+        data = self.redis.get(f"tree:{source}")
+        return json.loads(data) if data else None
+    
+    def save_tree(self, source: str, tree: Dict[str, Any]) -> bool:
+        return bool(self.redis.set(f"tree:{source}", json.dumps(tree)))
+    
+    def save_entities(self, entities: Iterable[Entity]) -> int:
+        """Сохранение пачками: один pipeline (один round trip) на пачку"""
+        saved = 0
+        for batch in _batches(entities, config.REDIS_WRITE_BATCH_SIZE):
+            pipe = self.redis.pipeline(transaction=config.REDIS_TRANSACTIONAL_WRITES)
+            for entity in batch:
+                pipe.set(self._get_key(entity.source, entity.source_id), entity.json())
+            saved += sum(1 for ok in pipe.execute() if ok)
+        return saved
+    
+    def delete_entities(self, source: str, source_ids: Iterable[str]) -> int:
+        """Удаление пачками: один DEL на пачку ключей"""
+        deleted = 0
+        for batch in _batches(source_ids, config.REDIS_WRITE_BATCH_SIZE):
+            deleted += self.redis.delete(*[self._get_key(source, source_id) for source_id in batch])
+        return deleted
+    
     def get_all_entities(self, source: Optional[str] = None) -> List[Entity]:
+        return list(self.iter_entities(source))
+    
+    def iter_entities(self, source: Optional[str] = None,
+                      batch_size: Optional[int] = None) -> Iterator[Entity]:
+        """
+        Ленивый обход сохраненных сущностей.
+        
+        Ключи перебираются через SCAN (в отличие от KEYS не блокирует Redis),
+        значения читаются одним MGET на пачку ключей.
+        """
         pattern = "entity:*" if source is None else f"entity:{source}:*"
-        keys = self.redis.keys(pattern)
-        entities = []
+        batch_size = batch_size or config.REDIS_SCAN_BATCH_SIZE
+        # SCAN может вернуть один ключ несколько раз
+        seen = set()
+        batch = []
         
-        for key in keys:
-            data = self.redis.get(key)
-            if data:
-                entities.append(Entity.parse_raw(data))
+        for key in self.redis.scan_iter(match=pattern, count=batch_size):
+            if key in seen:
+                continue
+            seen.add(key)
+            batch.append(key)
+            if len(batch) >= batch_size:
+                yield from self._load_batch(batch)
+                batch = []
         
-        return entities
\ No newline at end of file
+        if batch:
+            yield from self._load_batch(batch)
+    
+    def _load_batch(self, keys: List[bytes]) -> Iterator[Entity]:
+        for data in self.redis.mget(keys):
+            # Ключ мог быть удален между SCAN и MGET
+            if data:
+                yield Entity.parse_raw(data)
+
+
+class RedisHashStateManager(StateManager):
+    """
+    Реализация StateManager с одним Redis hash на источник.
+    
+    entities:{source}  - source_id -> entity (orjson/json, опционально zlib)
+    checksums:{source} - source_id -> checksum, читается без разбора entities
+    """
+    
+    SOURCES_KEY = "entity_sources"
+    
+    def __init__(self, compress: Optional[bool] = None):
+        self.redis = redis.from_url(config.REDIS_URL)
+        self.compress = config.STATE_COMPRESSION if compress is None else compress
+    
+    def _entities_key(self, source: str) -> str:
+        return f"entities:{source}"
+    
+    def _checksums_key(self, source: str) -> str:
+        return f"checksums:{source}"
+    
+    def _encode(self, entity: Entity) -> bytes:
+        if orjson is not None:
+            data = orjson.dumps(entity.dict())
+        else:
+            data = entity.json().encode()
+        return zlib.compress(data) if self.compress else data
+    
+    def _decode(self, data: bytes) -> Entity:
+        # Поток zlib начинается с 0x78, JSON - с "{", поэтому читаются оба формата
+        if data[:1] == b"x":
+            data = zlib.decompress(data)
+        if orjson is not None:
+            return Entity.parse_obj(orjson.loads(data))
+        return Entity.parse_raw(data)
+    
+    def _sources(self) -> List[str]:
+        return sorted(source.decode() for source in self.redis.smembers(self.SOURCES_KEY))
+    
+    def get_entity(self, source: str, source_id: str) -> Optional[Entity]:
+        data = self.redis.hget(self._entities_key(source), source_id)
+        if data:
+            return self._decode(data)
+        return None
+    
+    def get_entities(self, source: str, source_ids: Iterable[str]) -> List[Entity]:
+        """Один HMGET на пачку source_id"""
+        entities = []
+        for batch in _batches(source_ids, config.REDIS_SCAN_BATCH_SIZE):
+            entities.extend(self._decode(data) for data in self.redis.hmget(self._entities_key(source), batch) if data)
+        return entities
+    
+    def save_entity(self, entity: Entity) -> bool:
+        return self.save_entities([entity]) == 1
+    
+    def delete_entity(self, source: str, source_id: str) -> bool:
+        return self.delete_entities(source, [source_id]) == 1
+    
+    def get_all_entities(self, source: Optional[str] = None) -> List[Entity]:
+        return list(self.iter_entities(source))
+    
+    def iter_entities(self, source: Optional[str] = None,
+                      batch_size: Optional[int] = None) -> Iterator[Entity]:
+        """Ленивый обход entities через HSCAN"""
+        sources = self._sources() if source is None else [source]
+        batch_size = batch_size or config.REDIS_SCAN_BATCH_SIZE
+        for source_name in sources:
+            for _, data in self.redis.hscan_iter(self._entities_key(source_name), count=batch_size):
+                yield self._decode(data)
+    
+    def get_checksums(self, source: str) -> Dict[str, str]:
+        checksums = self.redis.hgetall(self._checksums_key(source))
+        return {source_id.decode(): checksum.decode() for source_id, checksum in checksums.items()}
+    
+    def get_tree(self, source: str) -> Optional[Dict[str, Any]]:
+        data = self.redis.get(f"tree:{source}")
+        return json.loads(data) if data else None
+    
+    def save_tree(self, source: str, tree: Dict[str, Any]) -> bool:
+        return bool(self.redis.set(f"tree:{source}", json.dumps(tree)))
+    
+    def save_entities(self, entities: Iterable[Entity]) -> int:
+        saved = 0
+        for batch in _batches(entities, config.REDIS_WRITE_BATCH_SIZE):
+            by_source = defaultdict(list)
+            for entity in batch:
+                by_source[entity.source].append(entity)
+            
+            pipe = self.redis.pipeline(transaction=config.REDIS_TRANSACTIONAL_WRITES)
+            for source, source_entities in by_source.items():
+                pipe.hset(self._entities_key(source),
+                          mapping={e.source_id: self._encode(e) for e in source_entities})
+                pipe.hset(self._checksums_key(source),
+                          mapping={e.source_id: e.checksum for e in source_entities})
+            pipe.sadd(self.SOURCES_KEY, *by_source)
+            pipe.execute()
+            saved += len(batch)
+        return saved
+    
+    def delete_entities(self, source: str, source_ids: Iterable[str]) -> int:
+        deleted = 0
+        for batch in _batches(source_ids, config.REDIS_WRITE_BATCH_SIZE):
+            pipe = self.redis.pipeline(transaction=config.REDIS_TRANSACTIONAL_WRITES)
+            pipe.hdel(self._entities_key(source), *batch)
+            pipe.hdel(self._checksums_key(source), *batch)
+            deleted += pipe.execute()[0]
+        return deleted
+
+
+def create_state_manager() -> StateManager:
+    """Создание StateManager согласно config.STATE_LAYOUT"""
+    if config.STATE_LAYOUT == "hash":
+        return RedisHashStateManager()
+    if config.STATE_LAYOUT == "keys":
+        return RedisStateManager()
+    raise ValueError(f"Unknown state layout: {config.STATE_LAYOUT}")
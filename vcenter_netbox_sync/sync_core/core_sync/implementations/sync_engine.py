@@ -1,34 +1,267 @@
 # Реализация SyncEngine
-from typing import Dict, Any, List
-from ..interfaces import SyncEngine, DataSource, SyncStrategy, Entity
+import time
+from typing import Dict, Any, Callable, Iterable, Iterator, List, Optional, Set, Tuple
+from ..interfaces import SyncEngine, StateManager, DataSource, SyncStrategy, Entity
+from ..entities import ChangePlan
+from ..strategies.base import BaseSyncStrategy
+from .planner import DiffPlanner
+from .merkle import ClusterKey, changed_clusters, cluster_key, invalidate, tree_from_leaves
+from ..config import config
+from ..utils.hashing import ALGORITHM
 from ..utils.logging import get_logger
 
 logger = get_logger(__name__)
 
+class _SourceScan:
+    """
+    Однократный обход потока entities источника.
+    
+    От каждой entity запоминается только лист дерева (cluster_key, source_id, checksum),
+    сами entities держит только тот, кому они нужны дальше.
+    """
+    
+    def __init__(self, entities: Iterable[Entity]):
+        self._entities = entities
+        self.started = time.monotonic()
+        self.finished = self.started
+        self.leaves: List[Tuple[ClusterKey, str, str]] = []
+    
+    def __iter__(self) -> Iterator[Entity]:
+        for entity in self._entities:
+            self.leaves.append((cluster_key(entity), entity.source_id, entity.checksum))
+            yield entity
+        self.finished = time.monotonic()
+    
+    @property
+    def elapsed(self) -> float:
+        # Загрузка источника идет параллельно с загрузкой цели и планированием
+        return self.finished - self.started
+    
+    def source_ids(self) -> Set[str]:
+        return {source_id for _, source_id, _ in self.leaves}
+    
+    def close(self):
+        close = getattr(self._entities, "close", None)
+        if close is not None:
+            close()
+
+class _StateBuffer:
+    """Сохранение неизмененных entities в состоянии пачками по ходу планирования"""
+    
+    def __init__(self, state_manager: Optional[StateManager], baseline: Dict[str, str]):
+        self.state_manager = state_manager
+        self.baseline = baseline
+        self.pending: List[Entity] = []
+        self.saved = 0
+    
+    def add(self, entity: Entity):
+        # Entity совпадает с целью, поэтому ее можно сохранить до применения плана;
+        # нужна она в состоянии, только если там другой checksum
+        if self.state_manager is None or self.baseline.get(entity.source_id) == entity.checksum:
+            return
+        self.pending.append(entity)
+        if len(self.pending) >= config.REDIS_WRITE_BATCH_SIZE:
+            self.flush()
+    
+    def flush(self) -> int:
+        if self.pending:
+            self.saved += self.state_manager.save_entities(self.pending)
+            self.pending = []
+        return self.saved
+
 class SimpleSyncEngine(SyncEngine):
     """Простая реализация SyncEngine"""
     
+    def __init__(self, state_manager: StateManager):
+        super().__init__(state_manager)
+        self.planner = DiffPlanner()
+    
     def sync(self, source: DataSource, target: DataSource, strategy: SyncStrategy) -> Dict[str, Any]:
-        """Выполнение синхронизации между источником и целью"""
-        logger.info("Starting synchronization process")
+        """
+        Выполнение синхронизации между источником и целью.
         
-        # Получение entities из источника и цели
-        source_entities = source.get_entities()
-        target_entities = target.get_entities()
+        Источник читается потоком (загрузка -> конвертация -> план): целиком в памяти
+        держится только цель, а от источника - листья дерева и entities, попавшие в план.
+        """
+        logger.info("Starting synchronization process")
         
-        logger.info(f"Retrieved {len(source_entities)} source entities and {len(target_entities)} target entities")
+        # Состояние хранится под именем источника (BaseDataSource.name)
+        source_name = getattr(source, "name", None)
+        old_tree = self._get_tree(source_name, strategy)
+        baseline = self._get_baseline(source_name) if isinstance(strategy, BaseSyncStrategy) else {}
+        # Поток начинает загрузку сразу, в том числе пока загружается цель
+        scan = _SourceScan(source.iter_entities())
+        tree = None
+        try:
+            if old_tree:
+                # Цель загружаем только для entities, checksum которых изменился с прошлого запуска
+                source_entities, skipped = self._split_unchanged(scan, baseline)
+                tree = tree_from_leaves(scan.leaves)
+                logger.info(f"{len(changed_clusters(old_tree, tree))} clusters changed since the last run")
+                keys, alt_keys = self._changed_keys(source_name, source_entities, baseline, scan.source_ids())
+                target_entities, target_time = self._timed(lambda: target.get_entities_by_keys(keys, alt_keys))
+            else:
+                target_entities, target_time = self._timed(target.get_entities)
+                source_entities, skipped = scan, []
+            target_done = time.monotonic()
+            
+            plan = None
+            phase_start = time.monotonic()
+            if isinstance(strategy, BaseSyncStrategy):
+                # Один план: стратегия его фильтрует, движок применяет, счетчики берутся из него же
+                state_buffer = _StateBuffer(self.state_manager if source_name else None, baseline)
+                plan = self.planner.plan(source_entities, target_entities, baseline if old_tree else None,
+                                         on_unchanged=state_buffer.add)
+                state_buffer.flush()
+                # Пропущенные entities входят в размер инвентаря для предела удалений
+                plan.unchanged.extend(skipped)
+                plan = self._filter_unsupported(target, strategy.filter_plan(plan))
+                result = plan.counts()
+                changes = plan.changes()
+            else:
+                # Стратегии без плана считают изменения сами по полному списку
+                source_entities = list(source_entities)
+                result = strategy.execute(source_entities, target_entities)
+                changes = self._calculate_changes(result, source_entities, target_entities)
+            plan_time = time.monotonic() - phase_start
+        finally:
+            scan.close()
         
-        # Выполнение стратегии синхронизации
-        result = strategy.execute(source_entities, target_entities)
+        source_time = scan.elapsed
+        fetch_time = max(scan.finished, target_done) - scan.started
+        logger.info(f"Retrieved {len(scan.leaves)} source entities in {source_time:.2f}s "
+                    f"and {len(target_entities)} target entities in {target_time:.2f}s"
+                    + (f", skipped {len(skipped)} unchanged" if old_tree else ""))
         
         # Применение изменений к цели
-        changes = self._calculate_changes(result, source_entities, target_entities)
-        if changes:
-            target.apply_changes(changes)
+        phase_start = time.monotonic()
+        applied = target.apply_changes(changes) if changes else True
+        apply_time = time.monotonic() - phase_start
+        
+        phase_start = time.monotonic()
+        if applied and plan is not None and plan.deletes:
+            applied = target.delete_entities(plan.deletes)
+        delete_time = time.monotonic() - phase_start
+        
+        phase_start = time.monotonic()
+        if applied and plan is not None:
+            tree = tree or tree_from_leaves(scan.leaves)
+            self._save_state(source_name, plan, tree, scan.source_ids(), baseline, state_buffer.saved)
+        state_time = time.monotonic() - phase_start
+        
+        result["fast_path"] = bool(old_tree)
+        result["circuit_breakers"] = self._breaker_states(source, target)
+        result["timings"] = {
+            "source_fetch": round(source_time, 3),
+            "target_fetch": round(target_time, 3),
+            "fetch": round(fetch_time, 3),
+            "plan": round(plan_time, 3),
+            "apply": round(apply_time, 3),
+            "delete": round(delete_time, 3),
+            "save_state": round(state_time, 3),
+        }
         
         logger.info(f"Synchronization completed: {result}")
         return result
     
+    def _get_baseline(self, source_name: Optional[str]) -> Dict[str, str]:
+        """Checksums источника с последней успешной синхронизации"""
+        if self.state_manager is None or source_name is None:
+            return {}
+        return self.state_manager.get_checksums(source_name)
+    
+    def _get_tree(self, source_name: Optional[str], strategy: SyncStrategy) -> Optional[Dict[str, Any]]:
+        """Дерево checksums источника с последней успешной синхронизации"""
+        if not isinstance(strategy, BaseSyncStrategy) or strategy.full_scan:
+            return None
+        if not config.SYNC_FAST_PATH or self.state_manager is None or source_name is None:
+            return None
+        tree = self.state_manager.get_tree(source_name)
+        if tree and tree.get("algorithm") != ALGORITHM:
+            # Сохраненные checksums несравнимы с новыми: полная синхронизация пересохранит состояние
+            logger.warning(f"Stored checksums of {source_name} use {tree.get('algorithm') or 'another algorithm'}, "
+                           f"now {ALGORITHM}: running a full sync")
+            return None
+        # Пустой корень: прошлый запуск оставил неудаленные entities, нужна полная загрузка цели
+        return tree if tree and tree.get("hash") else None
+    
+    @staticmethod
+    def _split_unchanged(scan: _SourceScan, baseline: Dict[str, str]) -> Tuple[List[Entity], List[str]]:
+        """
+        Отделение неизмененных entities по ходу загрузки источника.
+        
+        От entity с тем же checksum, что в состоянии, остается только source_id,
+        поэтому в памяти держатся только измененные и новые entities.
+        """
+        changed, unchanged = [], []
+        for entity in scan:
+            if baseline.get(entity.source_id) == entity.checksum:
+                unchanged.append(entity.source_id)
+            else:
+                changed.append(entity)
+        return changed, unchanged
+    
+    def _changed_keys(self, source_name: str, changed: List[Entity], baseline: Dict[str, str],
+                      present: Set[str]) -> Tuple[List[str], List[str]]:
+        """
+        Ключи сопоставления, по которым загружается цель: измененные и новые entities,
+        а также пропавшие из источника с прошлого запуска (их ключи берутся из состояния)
+        """
+        removed = self.state_manager.get_entities(
+            source_name, [source_id for source_id in baseline if source_id not in present])
+        entities = changed + removed
+        return [e.match_key for e in entities], [e.alt_key for e in entities if e.alt_key]
+    
+    def _save_state(self, source_name: Optional[str], plan: ChangePlan, tree: Dict[str, Any],
+                    present: Set[str], baseline: Dict[str, str], saved: int = 0):
+        """
+        Сохранение checksums примененных entities как базы для следующего запуска.
+        
+        Неизмененные entities сохраняются еще при планировании (saved - их количество),
+        здесь - записанные в цель; конфликты не сохраняются и будут проверены заново.
+        """
+        if self.state_manager is None or source_name is None:
+            return
+        saved += self.state_manager.save_entities(plan.changes())
+        # В состоянии хранятся entities источника: удаляем пропавшие из него, а не id цели
+        removed = [source_id for source_id in baseline if source_id not in present]
+        deleted = 0
+        if removed:
+            deleted = self.state_manager.delete_entities(source_name, removed)
+        # Кластеры с конфликтами должны быть проверены заново
+        tree = invalidate(tree, {cluster_key(c.source) for c in plan.conflicts})
+        if plan.skipped_deletes:
+            # Отложенные удаления быстрый путь не найдет: entities только в цели он не загружает.
+            # Сброс корня включает полную загрузку в следующем запуске. Удаления, отброшенные
+            # политикой стратегии (deferred_deletes), искать заново незачем
+            tree["hash"] = ""
+        tree["algorithm"] = ALGORITHM
+        self.state_manager.save_tree(source_name, tree)
+        logger.info(f"Saved state of {saved} entities, removed {deleted}")
+    
+    def _filter_unsupported(self, target: DataSource, plan: ChangePlan) -> ChangePlan:
+        """Отбрасывание удалений, если цель их не поддерживает"""
+        if plan.deletes and not target.supports_delete:
+            logger.warning(f"Skipping {len(plan.deletes)} deletes: target does not support deleting entities")
+            return plan.copy(update={"deletes": [], "skipped_deletes": plan.skipped_deletes + plan.deletes})
+        return plan
+    
+    @staticmethod
+    def _breaker_states(*data_sources: DataSource) -> Dict[str, Any]:
+        """Состояние circuit breaker адаптеров, у которых он есть"""
+        return {
+            getattr(data_source, "name", type(data_source).__name__): data_source.breaker.snapshot()
+            for data_source in data_sources
+            if getattr(data_source, "breaker", None) is not None
+        }
+    
+    @staticmethod
+    def _timed(fetch: Callable[[], List[Entity]]) -> Tuple[List[Entity], float]:
+        """Вызов fetch с замером времени выполнения"""
+        start = time.monotonic()
+        entities = fetch()
+        return entities, time.monotonic() - start
+    
     def _calculate_changes(self, result: Dict[str, Any], 
                           source_entities: List[Entity], 
                           target_entities: List[Entity]) -> List[Entity]:
@@ -36,12 +269,12 @@ class SimpleSyncEngine(SyncEngine):
         changes = []
         
         # Создаем словари для быстрого поиска
-        source_map = {e.source_id: e for e in source_entities}
-        target_map = {e.source_id: e for e in target_entities}
+        source_map = {e.match_key: e for e in source_entities}
+        target_map = {e.match_key: e for e in target_entities}
         
         # Добавляем новые и измененные entities
-        for source_id, entity in source_map.items():
-            if source_id not in target_map or entity.checksum != target_map[source_id].checksum:
+        for key, entity in source_map.items():
+            if key not in target_map or entity.checksum != target_map[key].checksum:
                 changes.append(entity)
         
         return changes
\ No newline at end of file
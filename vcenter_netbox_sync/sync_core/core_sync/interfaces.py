@@ -1,6 +1,6 @@
 # Абстрактные классы и интерфейсы
 from abc import ABC, abstractmethod
-from typing import List, Dict, Optional, Any
+from typing import Iterable, Iterator, List, Dict, Optional, Any
 from datetime import datetime
 from pydantic import BaseModel
 
@@ -12,6 +12,15 @@ class Entity(BaseModel):
     last_updated: datetime
     checksum: str
     data: Dict[str, Any]
+    # Ключ сопоставления с entity другой системы (для VM - vCenter UUID)
+    key: Optional[str] = None
+    # Запасной ключ для entities цели без key (для VM - имя в нижнем регистре)
+    alt_key: Optional[str] = None
+    
+    @property
+    def match_key(self) -> str:
+        """Ключ, по которому сопоставляются источник и цель; без key - source_id"""
+        return self.key or self.source_id
 
 class StateManager(ABC):
     """Абстрактный класс для управления состоянием"""
@@ -31,17 +40,65 @@ class StateManager(ABC):
     @abstractmethod
     def get_all_entities(self, source: Optional[str] = None) -> List[Entity]:
         pass
+    
+    def get_entities(self, source: str, source_ids: Iterable[str]) -> List[Entity]:
+        """Сохраненные entities источника с указанными source_id; отсутствующие пропускаются"""
+        entities = (self.get_entity(source, source_id) for source_id in source_ids)
+        return [e for e in entities if e is not None]
+    
+    def get_checksums(self, source: str) -> Dict[str, str]:
+        """Контрольные суммы сохраненных entities источника: source_id -> checksum"""
+        return {e.source_id: e.checksum for e in self.get_all_entities(source)}
+    
+    def get_tree(self, source: str) -> Optional[Dict[str, Any]]:
+        """Дерево checksums источника с последней успешной синхронизации"""
+        return None
+    
+    def save_tree(self, source: str, tree: Dict[str, Any]) -> bool:
+        """Сохранение дерева checksums; по умолчанию не поддерживается"""
+        return False
+    
+    def save_entities(self, entities: Iterable[Entity]) -> int:
+        """Сохранение набора entities, возвращает количество сохраненных"""
+        return sum(1 for entity in entities if self.save_entity(entity))
+    
+    def delete_entities(self, source: str, source_ids: Iterable[str]) -> int:
+        """Удаление набора entities, возвращает количество удаленных"""
+        return sum(1 for source_id in source_ids if self.delete_entity(source, source_id))
 
 class DataSource(ABC):
     """Абстрактный класс для источников данных"""
     
+    # Поддерживает ли источник удаление entities через delete_entities
+    supports_delete = False
+    
     @abstractmethod
     def get_entities(self) -> List[Entity]:
         pass
     
+    def iter_entities(self) -> Iterator[Entity]:
+        """Потоковое получение entities; по умолчанию поверх get_entities"""
+        return iter(self.get_entities())
+    
+    def get_entities_by_keys(self, keys: Iterable[str], alt_keys: Iterable[str] = ()) -> List[Entity]:
+        """
+        Entities с указанными match_key, а также entities без key с указанными alt_key.
+        
+        Ключи сопоставления общие для источника и цели, поэтому по ним цель ищет
+        пары для entities источника. Адаптеры могут переопределить выборочной загрузкой.
+        """
+        keys, alt_keys = set(keys), set(alt_keys)
+        if not keys and not alt_keys:
+            return []
+        return [e for e in self.get_entities()
+                if e.match_key in keys or (not e.key and e.alt_key in alt_keys)]
+    
     @abstractmethod
     def apply_changes(self, changes: List[Entity]) -> bool:
         pass
+    
+    def delete_entities(self, entities: List[Entity]) -> bool:
+        raise NotImplementedError(f"{type(self).__name__} does not support deleting entities")
 
 class SyncStrategy(ABC):
     """Абстрактный класс для стратегий синхронизации"""
@@ -4,20 +4,23 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from prefect import flow, task
-from core_sync.implementations.state_manager import RedisStateManager
+from core_sync.interfaces import StateManager
+from core_sync.implementations import state_manager as state_managers
 from core_sync.implementations.sync_engine import SimpleSyncEngine
 from core_sync.implementations.adapters.vsphere import VSphereAdapter
 from core_sync.implementations.adapters.netbox import NetboxAdapter
+from core_sync.strategies.base import BaseSyncStrategy
 from core_sync.strategies.conservative import ConservativeSyncStrategy
+from core_sync.strategies.aggressive import AggressiveSyncStrategy
 from core_sync.config import config
 from core_sync.utils.logging import get_logger
 
 logger = get_logger(__name__)
 
 @task
-def create_state_manager() -> RedisStateManager:
+def create_state_manager() -> StateManager:
     """Создание StateManager"""
-    return RedisStateManager()
+    return state_managers.create_state_manager()
 
 @task
 def create_vsphere_adapter() -> VSphereAdapter:
@@ -34,20 +37,22 @@ def create_netbox_adapter() -> NetboxAdapter:
     return NetboxAdapter()
 
 @task
-def create_sync_engine(state_manager: RedisStateManager) -> SimpleSyncEngine:
+def create_sync_engine(state_manager: StateManager) -> SimpleSyncEngine:
     """Создание SyncEngine"""
     return SimpleSyncEngine(state_manager)
 
 @task
-def create_sync_strategy() -> ConservativeSyncStrategy:
+def create_sync_strategy() -> BaseSyncStrategy:
     """Создание стратегии синхронизации"""
+    if config.SYNC_STRATEGY == "aggressive":
+        return AggressiveSyncStrategy()
     return ConservativeSyncStrategy()
 
 @task
 def execute_sync(sync_engine: SimpleSyncEngine, 
                 source_adapter: VSphereAdapter, 
                 target_adapter: NetboxAdapter,
-                strategy: ConservativeSyncStrategy) -> dict:
+                strategy: BaseSyncStrategy) -> dict:
     """Выполнение синхронизации"""
     return sync_engine.sync(source_adapter, target_adapter, strategy)
 
@@ -1 +1,30 @@
 # Агрессивная стратегия
+from typing import Optional
+from ..config import config
+from ..entities import ChangePlan
+from ..utils.logging import get_logger
+from .base import BaseSyncStrategy
+
+logger = get_logger(__name__)
+
+class AggressiveSyncStrategy(BaseSyncStrategy):
+    """Агрессивная стратегия: удаляет из цели entities, отсутствующие в источнике"""
+    
+    def __init__(self, max_delete_percent: Optional[float] = None, full_scan: Optional[bool] = None):
+        # Предел удалений за запуск в процентах от размера цели
+        self.max_delete_percent = (config.SYNC_MAX_DELETE_PERCENT
+                                   if max_delete_percent is None else max_delete_percent)
+        # Полная загрузка цели находит и entities, которых никогда не было в источнике
+        self.full_scan = config.SYNC_FULL_SCAN if full_scan is None else full_scan
+    
+    def filter_plan(self, plan: ChangePlan) -> ChangePlan:
+        """Удаления превышающие предел не применяются целиком: скорее всего источник вернул неполные данные"""
+        if not plan.deletes:
+            return plan
+        inventory = len(plan.updates) + len(plan.unchanged) + len(plan.conflicts) + len(plan.deletes)
+        limit = inventory * self.max_delete_percent / 100
+        if len(plan.deletes) > limit:
+            logger.error(f"Refusing to delete {len(plan.deletes)} of {inventory} target entities: "
+                         f"more than {self.max_delete_percent}% per run")
+            return plan.copy(update={"deletes": [], "skipped_deletes": plan.skipped_deletes + plan.deletes})
+        return plan
@@ -1 +1,20 @@
 # Базовая стратегия
+from typing import Dict, List
+from ..interfaces import SyncStrategy, Entity
+from ..entities import ChangePlan
+from ..implementations.planner import DiffPlanner
+
+class BaseSyncStrategy(SyncStrategy):
+    """Стратегия, работающая с планом изменений DiffPlanner"""
+    
+    # Загружать цель полностью, не используя сохраненное состояние
+    full_scan = False
+    
+    def filter_plan(self, plan: ChangePlan) -> ChangePlan:
+        """Отбор изменений плана, которые разрешено применять"""
+        return plan
+    
+    def execute(self, source_entities: List[Entity], target_entities: List[Entity]) -> Dict[str, int]:
+        """Подсчет изменений без применения"""
+        plan = DiffPlanner().plan(source_entities, target_entities)
+        return self.filter_plan(plan).counts()
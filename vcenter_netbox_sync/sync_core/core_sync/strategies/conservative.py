@@ -1,29 +1,10 @@
 # Консервативная стратегия
-from typing import Dict, List
-from ..interfaces import SyncStrategy, Entity
+from ..entities import ChangePlan
+from .base import BaseSyncStrategy
 
-class ConservativeSyncStrategy(SyncStrategy):
+class ConservativeSyncStrategy(BaseSyncStrategy):
     """Консервативная стратегия синхронизации"""
     
-    def execute(self, source_entities: List[Entity], target_entities: List[Entity]) -> Dict[str, int]:
-        """Выполнение консервативной синхронизации"""
-        result = {
-            "created": 0,
-            "updated": 0,
-            "deleted": 0,
-            "conflicts": 0
-        }
-        
-        # Создаем словари для быстрого поиска
-        source_map = {e.source_id: e for e in source_entities}
-        target_map = {e.source_id: e for e in target_entities}
-        
-        # Определяем новые и измененные entities
-        for source_id, entity in source_map.items():
-            if source_id not in target_map:
-                result["created"] += 1
-            elif entity.checksum != target_map[source_id].checksum:
-                result["updated"] += 1
-        
-        # В консервативной стратегии не удаляем entities
-        return result
\ No newline at end of file
+    def filter_plan(self, plan: ChangePlan) -> ChangePlan:
+        """В консервативной стратегии не удаляем entities"""
+        return plan.copy(update={"deletes": [], "deferred_deletes": plan.deferred_deletes + plan.deletes})
@@ -0,0 +1,104 @@
+# Circuit breaker
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict
+from ..config import config
+from .logging import get_logger
+
+logger = get_logger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Запрос отклонен без обращения к сервису: circuit breaker открыт"""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker по доле ошибок.
+
+    closed    - запросы проходят, результаты последних window вызовов учитываются;
+    open      - доля ошибок превысила failure_rate, запросы сразу отклоняются;
+    half_open - через reset_timeout пропускаются probes пробных запросов:
+                успех закрывает breaker, ошибка снова открывает.
+    """
+
+    def __init__(self, name: str, failure_rate: float = None, window: int = None,
+                 min_calls: int = None, reset_timeout: float = None, probes: int = 1):
+        self.name = name
+        self.failure_rate = config.CIRCUIT_FAILURE_RATE if failure_rate is None else failure_rate
+        self.min_calls = config.CIRCUIT_MIN_CALLS if min_calls is None else min_calls
+        self.reset_timeout = config.CIRCUIT_RESET_TIMEOUT if reset_timeout is None else reset_timeout
+        self.probes = probes
+        self.results = deque(maxlen=config.CIRCUIT_WINDOW if window is None else window)
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.rejected = 0
+        self._probes_in_flight = 0
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """Проверка перед запросом; CircuitOpenError, если запрос выполнять нельзя"""
+        with self.lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"Circuit '{self.name}' is open")
+                self.state = HALF_OPEN
+                self._probes_in_flight = 0
+                logger.info(f"Circuit '{self.name}' is half-open, probing")
+            if self.state == HALF_OPEN:
+                if self._probes_in_flight >= self.probes:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"Circuit '{self.name}' is half-open, waiting for probe")
+                self._probes_in_flight += 1
+
+    def record_success(self):
+        with self.lock:
+            if self.state == HALF_OPEN:
+                logger.info(f"Circuit '{self.name}' closed")
+                self.state = CLOSED
+                self.results.clear()
+            self.results.append(True)
+
+    def record_failure(self):
+        with self.lock:
+            if self.state == HALF_OPEN:
+                self._open()
+                return
+            self.results.append(False)
+            failures = self.results.count(False)
+            if len(self.results) >= self.min_calls and failures / len(self.results) >= self.failure_rate:
+                self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        self.results.clear()
+        logger.error(f"Circuit '{self.name}' opened, failing fast for {self.reset_timeout}s")
+
+    def call(self, func: Callable, *args, **kwargs) -> Any:
+        """Вызов func через breaker: любое исключение считается ошибкой"""
+        self.allow()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Состояние для результата синхронизации"""
+        with self.lock:
+            return {
+                "state": self.state,
+                "times_opened": self.times_opened,
+                "rejected": self.rejected,
+            }
@@ -0,0 +1,71 @@
+# Канонические checksums entities
+import hashlib
+from typing import Any, Optional, Tuple
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+# Состояния питания vSphere в терминах статусов Netbox
+STATUS_MAPPING = {
+    "poweredOn": "active",
+    "poweredOff": "offline",
+}
+
+SEPARATOR = "\x1f"
+
+# Имя алгоритма входит в checksum: хеши разных алгоритмов одной длины,
+# и без него смена алгоритма (установка или удаление xxhash) была бы незаметна
+ALGORITHM = "xxh3" if xxhash is not None else "blake2b"
+
+
+def _to_int(value: Any) -> int:
+    # Netbox отдает vcpus как decimal ("2.00")
+    if value is None or value == "":
+        return 0
+    return int(float(value))
+
+
+def canonical_vm(name: str, status: Optional[str], vcpus: Any, memory: Any) -> Tuple[str, str, int, int]:
+    """Нормализованный набор полей VM, одинаковый для vSphere и Netbox"""
+    status = status or ""
+    return name.strip(), STATUS_MAPPING.get(status, status), _to_int(vcpus), _to_int(memory)
+
+
+def digest(values: Tuple) -> str:
+    """Быстрый некриптографический хеш: xxh3 при наличии xxhash, иначе blake2b на 8 байт"""
+    data = SEPARATOR.join(str(value) for value in values).encode()
+    if xxhash is not None:
+        return f"{ALGORITHM}:{xxhash.xxh3_64_hexdigest(data)}"
+    return f"{ALGORITHM}:{hashlib.blake2b(data, digest_size=8).hexdigest()}"
+
+
+def vm_checksum(name: str, status: Optional[str], vcpus: Any, memory: Any) -> str:
+    return digest(canonical_vm(name, status, vcpus, memory))
+
+
+if __name__ == "__main__":
+    # Микробенчмарк: python -m core_sync.utils.hashing [count]
+    import json
+    import sys
+    import timeit
+    
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    items = [
+        {"name": f"vm-{i}", "power_state": "poweredOn", "cpu_count": 2, "memory_mb": 4096}
+        for i in range(count)
+    ]
+    
+    def md5_json():
+        for item in items:
+            hashlib.md5(json.dumps(item, sort_keys=True).encode()).hexdigest()
+    
+    def canonical():
+        for item in items:
+            vm_checksum(item["name"], item["power_state"], item["cpu_count"], item["memory_mb"])
+    
+    print(f"{count} entities, digest: {ALGORITHM}")
+    for name, func in (("json + md5", md5_json), ("canonical", canonical)):
+        seconds = min(timeit.repeat(func, number=1, repeat=5))
+        print(f"{name:>12}: {seconds * 1000:8.1f} ms total, {seconds / count * 1e6:6.2f} us/entity")
@@ -0,0 +1,135 @@
+# Утилиты HTTP
+import time
+from typing import Dict, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from ..config import config
+from .retry import AdaptiveConcurrency, RateLimiter, backoff_delay, parse_retry_after
+from .circuit_breaker import CircuitBreaker
+
+# Ответы перегруженного сервера: запрос не обработан, его можно повторить
+OVERLOAD_STATUSES = (429, 503)
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter с таймаутом по умолчанию для всех запросов сессии"""
+
+    def __init__(self, *args, timeout: Optional[float] = None, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+class RateLimitedHTTPAdapter(TimeoutHTTPAdapter):
+    """
+    Адаптер с ограничением частоты по endpoint, адаптивной параллельностью
+    и повтором запросов при 429/503 с учетом Retry-After.
+
+    Если задан breaker, ошибки соединения и итоговые ответы 5xx учитываются им,
+    а при открытом breaker запрос сразу завершается CircuitOpenError.
+    """
+
+    def __init__(self, *args, limiter: Optional[RateLimiter] = None,
+                 concurrency: Optional[AdaptiveConcurrency] = None,
+                 breaker: Optional[CircuitBreaker] = None,
+                 overload_retries: int = 3, **kwargs):
+        self.limiter = limiter
+        self.concurrency = concurrency
+        self.breaker = breaker
+        self.overload_retries = overload_retries
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if self.breaker is None:
+            return self._send_with_retries(request, **kwargs)
+        self.breaker.allow()
+        try:
+            response = self._send_with_retries(request, **kwargs)
+        except requests.RequestException:
+            self.breaker.record_failure()
+            raise
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    def _send_with_retries(self, request, **kwargs):
+        for attempt in range(self.overload_retries + 1):
+            if self.limiter:
+                self.limiter.acquire(request.url)
+            if self.concurrency:
+                self.concurrency.acquire()
+            try:
+                response = super().send(request, **kwargs)
+            finally:
+                if self.concurrency:
+                    self.concurrency.release()
+
+            if response.status_code not in OVERLOAD_STATUSES:
+                if self.concurrency:
+                    self.concurrency.on_success()
+                return response
+            if self.concurrency:
+                self.concurrency.on_overload()
+            if attempt == self.overload_retries:
+                return response
+
+            delay = parse_retry_after(response.headers.get("Retry-After"))
+            if delay is None:
+                delay = backoff_delay(attempt)
+            delay = min(delay, config.HTTP_RETRY_MAX_DELAY)
+            response.close()
+            time.sleep(delay)
+
+
+def create_session(pool_size: Optional[int] = None,
+                   retries: Optional[int] = None,
+                   timeout: Optional[float] = None,
+                   headers: Optional[Dict[str, str]] = None,
+                   verify: Optional[bool] = None,
+                   breaker: Optional[CircuitBreaker] = None) -> requests.Session:
+    """
+    Создание сессии с пулом keep-alive соединений.
+
+    Параллельные запросы идут по отдельным соединениям из пула,
+    поэтому pool_size должен быть не меньше числа потоков.
+    """
+    pool_size = pool_size or config.HTTP_POOL_SIZE
+    retries = config.HTTP_RETRIES if retries is None else retries
+    # Ошибки соединения и 502/504; 429/503 обрабатывает RateLimitedHTTPAdapter
+    retry = Retry(
+        total=retries,
+        backoff_factor=config.HTTP_BACKOFF_FACTOR,
+        status_forcelist=(502, 504),
+        # Повторяем только идемпотентные методы
+        allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    )
+    limiter = None
+    if config.HTTP_RATE_LIMIT > 0:
+        limiter = RateLimiter(config.HTTP_RATE_LIMIT, config.HTTP_RATE_BURST or None)
+    adapter = RateLimitedHTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=retry,
+        timeout=config.HTTP_TIMEOUT if timeout is None else timeout,
+        limiter=limiter,
+        concurrency=AdaptiveConcurrency(pool_size, minimum=config.HTTP_MIN_CONCURRENCY),
+        breaker=breaker,
+        overload_retries=retries,
+    )
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.verify = config.HTTP_VERIFY_SSL if verify is None else verify
+    if headers:
+        session.headers.update(headers)
+    return session
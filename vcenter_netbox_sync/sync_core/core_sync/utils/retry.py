@@ -1 +1,167 @@
 # Утилиты повторных попыток
+import functools
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional, Tuple, Type
+from urllib.parse import urlsplit
+import requests
+from ..config import config
+from .logging import get_logger
+
+logger = get_logger(__name__)
+
+# Статусы, при которых запрос можно повторить: сервер просит подождать или временно недоступен
+RETRY_STATUSES = (429, 502, 503, 504)
+# Сетевые ошибки, после которых запрос можно повторить; ошибки 4xx и ошибки кода не повторяются
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)
+
+
+def backoff_delay(attempt: int, base: float = None, cap: float = None) -> float:
+    """Экспоненциальная задержка с полным jitter: случайное значение в [0, base * 2^attempt]"""
+    base = config.HTTP_BACKOFF_FACTOR if base is None else base
+    cap = config.HTTP_RETRY_MAX_DELAY if cap is None else cap
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Значение Retry-After в секундах: число секунд или HTTP-дата"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_transient(error: BaseException,
+                 exceptions: Tuple[Type[BaseException], ...] = TRANSIENT_ERRORS,
+                 statuses: Tuple[int, ...] = RETRY_STATUSES) -> bool:
+    """Временная ли ошибка: сетевая или HTTPError с повторяемым статусом"""
+    if isinstance(error, exceptions):
+        return True
+    response = getattr(error, "response", None)
+    return isinstance(error, requests.HTTPError) and response is not None and response.status_code in statuses
+
+
+def retry(attempts: int = None,
+          exceptions: Tuple[Type[BaseException], ...] = TRANSIENT_ERRORS,
+          statuses: Tuple[int, ...] = RETRY_STATUSES,
+          base: float = None,
+          cap: float = None) -> Callable:
+    """Декоратор повторных попыток с экспоненциальной задержкой и jitter, только для временных ошибок"""
+    attempts = config.HTTP_RETRIES + 1 if attempts is None else attempts
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(attempts):
+                try:
+                    return func(*args, **kwargs)
+                except Exception as e:
+                    if attempt == attempts - 1 or not is_transient(e, exceptions, statuses):
+                        raise
+                    delay = backoff_delay(attempt, base, cap)
+                    logger.warning(f"{func.__name__} failed ({e}), retrying in {delay:.2f}s "
+                                   f"({attempt + 1}/{attempts - 1})")
+                    time.sleep(delay)
+        return wrapper
+    return decorator
+
+
+class TokenBucket:
+    """Ограничение частоты: rate токенов в секунду, не больше capacity подряд"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        """Ожидание, пока в корзине не появится нужное количество токенов"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimiter:
+    """Отдельная TokenBucket на каждый endpoint"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def endpoint(url: str) -> str:
+        # /api/virtualization/virtual-machines/42/ и .../43/ - один endpoint
+        parts = urlsplit(url)
+        return parts.netloc + re.sub(r"/\d+(?=/|$)", "", parts.path)
+
+    def acquire(self, url: str):
+        key = self.endpoint(url)
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = TokenBucket(self.rate, self.capacity)
+        bucket.acquire()
+
+
+class AdaptiveConcurrency:
+    """
+    Ограничение числа одновременных запросов по схеме AIMD.
+
+    Предел уменьшается вдвое при перегрузке (429/503) и растет на единицу
+    после каждых limit успешных запросов.
+    """
+
+    def __init__(self, initial: int, minimum: int = 1, maximum: int = None):
+        self.minimum = max(1, minimum)
+        self.maximum = maximum or initial
+        self.limit = min(max(initial, self.minimum), self.maximum)
+        self.active = 0
+        self._successes = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while self.active >= self.limit:
+                self.condition.wait()
+            self.active += 1
+
+    def release(self):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify()
+
+    def on_success(self):
+        with self.condition:
+            self._successes += 1
+            if self._successes >= self.limit and self.limit < self.maximum:
+                self._successes = 0
+                self.limit += 1
+                self.condition.notify()
+
+    def on_overload(self):
+        with self.condition:
+            self._successes = 0
+            new_limit = max(self.minimum, self.limit // 2)
+            if new_limit < self.limit:
+                logger.warning(f"Backend overloaded, reducing concurrency from {self.limit} to {new_limit}")
+                self.limit = new_limit
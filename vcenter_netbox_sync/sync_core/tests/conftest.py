@@ -0,0 +1,51 @@
+# Общие фикстуры тестов
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core_sync.interfaces import Entity, StateManager  # noqa: E402
+
+
+def make_entity(source_id: str, checksum: str = "c", source: str = "vsphere",
+                key: Optional[str] = None, alt_key: Optional[str] = None, **data) -> Entity:
+    return Entity(id=f"{source}-{source_id}", source=source, source_id=source_id,
+                  last_updated=datetime.now(), checksum=checksum, data=data,
+                  key=key, alt_key=alt_key)
+
+
+class MemoryStateManager(StateManager):
+    """Состояние в памяти вместо Redis"""
+
+    def __init__(self):
+        self.entities: Dict[str, Dict[str, Entity]] = {}
+        self.trees: Dict[str, Dict[str, Any]] = {}
+
+    def get_entity(self, source: str, source_id: str) -> Optional[Entity]:
+        return self.entities.get(source, {}).get(source_id)
+
+    def save_entity(self, entity: Entity) -> bool:
+        self.entities.setdefault(entity.source, {})[entity.source_id] = entity
+        return True
+
+    def delete_entity(self, source: str, source_id: str) -> bool:
+        return self.entities.get(source, {}).pop(source_id, None) is not None
+
+    def get_all_entities(self, source: Optional[str] = None) -> List[Entity]:
+        return list(self.entities.get(source, {}).values())
+
+    def get_tree(self, source: str) -> Optional[Dict[str, Any]]:
+        return self.trees.get(source)
+
+    def save_tree(self, source: str, tree: Dict[str, Any]) -> bool:
+        self.trees[source] = tree
+        return True
+
+
+@pytest.fixture
+def state_manager() -> MemoryStateManager:
+    return MemoryStateManager()
@@ -0,0 +1,67 @@
+# Circuit breaker и его учет в HTTP-адаптере
+import pytest
+import requests
+
+from core_sync.utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from core_sync.utils.http import RateLimitedHTTPAdapter
+
+
+def failing():
+    raise ConnectionError("down")
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.min_calls):
+        with pytest.raises(ConnectionError):
+            breaker.call(failing)
+
+
+def test_opens_after_failure_rate_and_rejects():
+    breaker = CircuitBreaker("test", failure_rate=0.5, window=10, min_calls=4, reset_timeout=60)
+    open_breaker(breaker)
+    assert breaker.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: "not called")
+    assert breaker.snapshot() == {"state": OPEN, "times_opened": 1, "rejected": 1}
+
+
+def test_stays_closed_below_min_calls():
+    breaker = CircuitBreaker("test", failure_rate=0.5, window=10, min_calls=4, reset_timeout=60)
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            breaker.call(failing)
+    assert breaker.state == CLOSED
+
+
+def test_probe_closes_or_reopens():
+    breaker = CircuitBreaker("test", failure_rate=0.5, window=10, min_calls=2, reset_timeout=60)
+    open_breaker(breaker)
+    breaker.opened_at -= 61
+    breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # Пока пробный запрос не завершен, остальные отклоняются
+    with pytest.raises(CircuitOpenError):
+        breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.times_opened == 2
+
+    breaker.opened_at -= 61
+    assert breaker.call(lambda: "ok") == "ok"
+    assert breaker.state == CLOSED
+
+
+class StubResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+
+
+@pytest.mark.parametrize("status, state", [(500, OPEN), (404, CLOSED)])
+def test_adapter_counts_only_5xx_as_failures(monkeypatch, status, state):
+    breaker = CircuitBreaker("test", failure_rate=0.5, window=10, min_calls=2, reset_timeout=60)
+    adapter = RateLimitedHTTPAdapter(breaker=breaker, overload_retries=0)
+    monkeypatch.setattr(RateLimitedHTTPAdapter, "_send_with_retries", lambda self, request, **kwargs: StubResponse(status))
+    request = requests.Request("GET", "http://netbox.example.com/api/").prepare()
+    for _ in range(2):
+        adapter.send(request)
+    assert breaker.state == state
@@ -0,0 +1,30 @@
+# Повторные попытки только для временных ошибок
+import pytest
+import requests
+
+from core_sync.utils.retry import retry
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(response=response)
+
+
+@pytest.mark.parametrize("error, calls", [
+    (requests.ConnectionError("reset"), 3),
+    (http_error(503), 3),
+    (http_error(404), 1),
+    (ValueError("bug"), 1),
+])
+def test_retries_only_transient_errors(error, calls):
+    attempts = []
+
+    @retry(attempts=3, base=0)
+    def request():
+        attempts.append(1)
+        raise error
+
+    with pytest.raises(type(error)):
+        request()
+    assert len(attempts) == calls
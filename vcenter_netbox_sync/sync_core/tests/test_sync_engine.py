@@ -0,0 +1,236 @@
+# Планировщик, дерево checksums и быстрый путь движка
+import time
+
+import pytest
+
+from core_sync.config import config
+from core_sync.implementations.adapters.netbox import NetboxAdapter
+from core_sync.implementations.adapters.vsphere import VSphereAdapter
+from core_sync.implementations.merkle import build_tree, changed_clusters
+from core_sync.implementations.planner import DiffPlanner
+from core_sync.implementations.sync_engine import SimpleSyncEngine
+from core_sync.strategies.aggressive import AggressiveSyncStrategy
+from core_sync.strategies.conservative import ConservativeSyncStrategy
+from core_sync.utils import hashing
+from core_sync.utils.hashing import vm_checksum
+
+from .conftest import make_entity
+
+VM_UUID = "4210a1b2-0000-0000-0000-000000000001"
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+class FakeNetboxSession:
+    """Список VM Netbox с фильтрами id, cf_vcenter_uuid и name__ie"""
+
+    def __init__(self, records):
+        self.records = records
+        self.params = []
+        self.deleted = []
+
+    def get(self, url, params=None):
+        params = dict(params or {})
+        self.params.append(params)
+        records = self.records
+        for field, values in params.items():
+            values = values if isinstance(values, list) else [values]
+            if field == "id":
+                if not all(str(value).isdigit() for value in values):
+                    raise AssertionError(f"Netbox answers 400 to id={values}")
+                records = [r for r in records if str(r["id"]) in map(str, values)]
+            elif field.startswith("cf_"):
+                records = [r for r in records if r["custom_fields"].get(field[3:]) in values]
+            elif field == "name__ie":
+                records = [r for r in records if r["name"].lower() in {v.lower() for v in values}]
+        return FakeResponse({"count": len(records), "next": None, "results": records})
+
+    def delete(self, url, json=None):
+        ids = {item["id"] for item in json}
+        self.deleted.extend(sorted(ids))
+        self.records = [r for r in self.records if r["id"] not in ids]
+        return FakeResponse(None)
+
+
+def netbox_vm(vm_id, name, vm_uuid=None, cpus=2):
+    return {"id": vm_id, "name": name, "status": {"value": "active"}, "vcpus": cpus,
+            "memory": 4096, "custom_fields": {"vcenter_uuid": vm_uuid}}
+
+
+def netbox_adapter(records):
+    adapter = NetboxAdapter()
+    adapter.fetch_workers = 1
+    adapter.session = FakeNetboxSession(records)
+    return adapter
+
+
+def sync(engine, source, target, strategy):
+    result = engine.sync(source, target, strategy)
+    result.pop("timings")
+    result.pop("circuit_breakers")
+    return result
+
+
+def test_planner_pairs_on_key_not_source_id():
+    source = [make_entity("vm-001", "same", key="U1")]
+    target = [make_entity("42", "same", source="netbox", key="U1")]
+    plan = DiffPlanner().plan(source, target)
+    assert plan.unchanged == ["vm-001"]
+    assert not plan.creates and not plan.deletes
+
+
+def test_planner_falls_back_to_name_only_for_keyless_targets():
+    source = [make_entity("vm-001", "a", key="U1", alt_key="web"),
+              make_entity("vm-002", "b", key="U2", alt_key="db")]
+    target = [make_entity("42", "old", source="netbox", alt_key="web"),
+              make_entity("43", "b", source="netbox", key="U9", alt_key="db")]
+    plan = DiffPlanner().plan(source, target)
+    assert [e.source_id for e in plan.updates] == ["vm-001"]
+    # У записи "db" другой UUID: это другая VM
+    assert [e.source_id for e in plan.creates] == ["vm-002"]
+    assert [e.source_id for e in plan.deletes] == ["43"]
+
+
+def test_planner_reports_conflict_against_baseline():
+    source = [make_entity("vm-001", "new-source", key="U1")]
+    target = [make_entity("42", "new-target", source="netbox", key="U1")]
+    plan = DiffPlanner().plan(source, target, baseline={"vm-001": "old"})
+    assert len(plan.conflicts) == 1 and not plan.updates
+
+
+def test_tree_marks_only_changed_cluster():
+    entities = [make_entity(str(i), "c", datacenter="dc", cluster=f"cl{i % 2}") for i in range(4)]
+    old = build_tree(entities)
+    entities[1] = make_entity("1", "changed", datacenter="dc", cluster="cl1")
+    assert changed_clusters(old, build_tree(entities)) == {("dc", "cl1")}
+    assert changed_clusters(old, old) == set()
+
+
+def test_same_vm_in_both_systems_is_unchanged(state_manager):
+    vsphere = VSphereAdapter("host", "user", "password")
+    netbox = netbox_adapter([netbox_vm(42, "test-vm-1", VM_UUID)])
+    result = sync(SimpleSyncEngine(state_manager), vsphere, netbox, AggressiveSyncStrategy(max_delete_percent=100))
+    assert result["unchanged"] == 1
+    assert result["created"] == 0 and result["deleted"] == 0
+
+
+def test_fast_path_fetches_target_by_key(state_manager):
+    vsphere = VSphereAdapter("host", "user", "password")
+    netbox = netbox_adapter([netbox_vm(42, "test-vm-1", VM_UUID)])
+    engine = SimpleSyncEngine(state_manager)
+    sync(engine, vsphere, netbox, ConservativeSyncStrategy())
+
+    record = vsphere._fetch_raw_data()[0]
+    vsphere._fetch_raw_data = lambda: [dict(record, cpu_count=4)]
+    result = sync(engine, vsphere, netbox, ConservativeSyncStrategy())
+
+    assert result["fast_path"] and result["updated"] == 1
+    assert all("id" not in params for params in netbox.session.params)
+    assert {"cf_vcenter_uuid": [VM_UUID], "limit": netbox.page_size} in netbox.session.params
+
+
+def test_conservative_strategy_keeps_fast_path_with_target_only_vms(state_manager):
+    vsphere = VSphereAdapter("host", "user", "password")
+    netbox = netbox_adapter([netbox_vm(42, "test-vm-1", VM_UUID), netbox_vm(50, "manual", "U-other")])
+    engine = SimpleSyncEngine(state_manager)
+    result = sync(engine, vsphere, netbox, ConservativeSyncStrategy())
+    assert result["delete_deferred"] == 1 and result["delete_skipped"] == 0
+
+    assert sync(engine, vsphere, netbox, ConservativeSyncStrategy())["fast_path"]
+
+
+def test_delete_refused_by_cap_is_found_again(state_manager):
+    vsphere = VSphereAdapter("host", "user", "password")
+    netbox = netbox_adapter([netbox_vm(42, "test-vm-1", VM_UUID), netbox_vm(50, "manual", "U-other")])
+    engine = SimpleSyncEngine(state_manager)
+    strategy = AggressiveSyncStrategy(max_delete_percent=10)
+    assert sync(engine, vsphere, netbox, strategy)["delete_skipped"] == 1
+
+    result = sync(engine, vsphere, netbox, strategy)
+    assert not result["fast_path"]
+    assert result["delete_skipped"] == 1
+
+
+def test_removed_source_vm_is_dropped_from_state(state_manager):
+    vsphere = VSphereAdapter("host", "user", "password")
+    netbox = netbox_adapter([netbox_vm(42, "test-vm-1", VM_UUID)])
+    engine = SimpleSyncEngine(state_manager)
+    sync(engine, vsphere, netbox, ConservativeSyncStrategy())
+    vsphere._fetch_raw_data = lambda: []
+
+    result = sync(engine, vsphere, netbox, AggressiveSyncStrategy(max_delete_percent=100))
+
+    assert result["deleted"] == 1 and netbox.session.deleted == [42]
+    assert state_manager.get_checksums("vsphere") == {}
+
+
+def test_full_sync_plans_from_the_source_stream(state_manager):
+    vsphere = VSphereAdapter("host", "user", "password")
+    vsphere.get_entities = lambda: pytest.fail("the engine must not load the whole source list")
+    netbox = netbox_adapter([netbox_vm(42, "test-vm-1", VM_UUID)])
+    result = sync(SimpleSyncEngine(state_manager), vsphere, netbox, ConservativeSyncStrategy())
+    assert result["unchanged"] == 1
+    # Неизмененная entity сохранена в состоянии еще при планировании
+    assert list(state_manager.get_checksums("vsphere")) == ["vm-001"]
+
+
+def test_stream_buffer_is_bounded(monkeypatch):
+    monkeypatch.setattr(config, "STREAM_BUFFER_SIZE", 2)
+    vsphere = VSphereAdapter("host", "user", "password")
+    record = vsphere._fetch_raw_data()[0]
+    fetched = []
+
+    def fetch():
+        for i in range(10):
+            fetched.append(i)
+            yield dict(record, id=f"vm-{i}")
+
+    vsphere._fetch_raw_data = fetch
+    stream = vsphere.iter_entities()
+    time.sleep(0.2)
+    # Две entities в очереди и одна ждет места
+    assert len(fetched) == 3
+    assert len(list(stream)) == 10
+
+
+def test_stream_raises_fetch_error():
+    vsphere = VSphereAdapter("host", "user", "password")
+
+    def fetch():
+        yield from VSphereAdapter._fetch_raw_data(vsphere)
+        raise ConnectionError("vSphere unavailable")
+
+    vsphere._fetch_raw_data = fetch
+    with pytest.raises(ConnectionError):
+        list(vsphere.iter_entities())
+
+
+def test_checksum_maps_power_state_to_netbox_status():
+    assert vm_checksum("vm-1", "active", 2, 4096) == vm_checksum("vm-1", "poweredOn", 2, 4096)
+    assert vm_checksum("vm-1", "offline", 2, 4096) != vm_checksum("vm-1", "poweredOn", 2, 4096)
+
+
+def test_checksum_names_its_algorithm():
+    assert vm_checksum("vm-1", "poweredOn", 2, 4096).startswith(f"{hashing.ALGORITHM}:")
+
+
+def test_algorithm_change_forces_full_sync(state_manager, monkeypatch):
+    vsphere = VSphereAdapter("host", "user", "password")
+    netbox = netbox_adapter([netbox_vm(42, "test-vm-1", VM_UUID)])
+    engine = SimpleSyncEngine(state_manager)
+    sync(engine, vsphere, netbox, ConservativeSyncStrategy())
+    assert sync(engine, vsphere, netbox, ConservativeSyncStrategy())["fast_path"]
+
+    monkeypatch.setattr("core_sync.implementations.sync_engine.ALGORITHM", "other")
+    result = sync(engine, vsphere, netbox, ConservativeSyncStrategy())
+    assert not result["fast_path"] and result["unchanged"] == 1
+    assert sync(engine, vsphere, netbox, ConservativeSyncStrategy())["fast_path"]